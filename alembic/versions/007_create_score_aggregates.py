@@ -0,0 +1,57 @@
+"""Added score aggregates
+
+Revision ID: 3c6f2a9d8e41
+Revises: f9e7ce2b5291
+Create Date: 2026-10-18 10:12:37.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c6f2a9d8e41'
+down_revision: Union[str, None] = 'f9e7ce2b5291'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('score_aggregates',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('company_id', sa.UUID(), nullable=True),
+    sa.Column('quiz_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('last_quiz_id', sa.UUID(), nullable=True),
+    sa.Column('last_submission_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['company_id'], ['company.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['last_quiz_id'], ['quizzes.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('_score_aggregates_user_uc', 'score_aggregates', ['user_id'], unique=True,
+                    postgresql_where=sa.text('company_id IS NULL'))
+    op.create_index('_score_aggregates_user_company_uc', 'score_aggregates', ['user_id', 'company_id'], unique=True,
+                    postgresql_where=sa.text('company_id IS NOT NULL'))
+    op.execute("""
+        INSERT INTO score_aggregates (id, user_id, company_id, quiz_count, score_sum, last_quiz_id, last_submission_at)
+        SELECT gen_random_uuid(), r.user_id, NULL, count(*), sum(r.score),
+               (array_agg(r.quiz_id ORDER BY r.created_at DESC))[1], max(r.created_at)
+        FROM results r
+        GROUP BY r.user_id
+        UNION ALL
+        SELECT gen_random_uuid(), r.user_id, q.company_id, count(*), sum(r.score),
+               (array_agg(r.quiz_id ORDER BY r.created_at DESC))[1], max(r.created_at)
+        FROM results r
+        JOIN quizzes q ON q.id = r.quiz_id
+        GROUP BY r.user_id, q.company_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('_score_aggregates_user_company_uc', table_name='score_aggregates')
+    op.drop_index('_score_aggregates_user_uc', table_name='score_aggregates')
+    op.drop_table('score_aggregates')
@@ -0,0 +1,46 @@
+"""Added indexes for the hot query predicates
+
+Revision ID: 8a41d7c3b5f2
+Revises: 3c6f2a9d8e41
+Create Date: 2026-10-18 14:02:11.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a41d7c3b5f2'
+down_revision: Union[str, None] = '3c6f2a9d8e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_results_user_id_quiz_id', 'results', ['user_id', 'quiz_id'], {}),
+    ('ix_results_user_id_created_at', 'results', ['user_id', sa.text('created_at DESC')], {}),
+    ('ix_actions_user_id_status', 'actions', ['user_id', 'status'], {}),
+    ('ix_actions_company_id_status', 'actions', ['company_id', 'status'], {}),
+    ('ix_questions_quiz_id', 'questions', ['quiz_id'], {}),
+    ('ix_answers_question_id', 'answers', ['question_id'], {'postgresql_include': ['is_correct']}),
+    ('ix_user_answer_result_id', 'user_answer', ['result_id'], {}),
+    ('ix_quizzes_company_id', 'quizzes', ['company_id'], {}),
+    ('ix_company_visible_id', 'company', ['visible', 'id'], {}),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True,
+                            if_not_exists=True, **kwargs)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True,
+                          if_exists=True)
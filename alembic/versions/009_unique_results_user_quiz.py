@@ -0,0 +1,87 @@
+"""Added unique user quiz constraint on results
+
+Revision ID: c27e9b04f6a3
+Revises: 8a41d7c3b5f2
+Create Date: 2026-10-18 15:21:48.230961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27e9b04f6a3'
+down_revision: Union[str, None] = '8a41d7c3b5f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def refresh_score_aggregates() -> None:
+    op.execute("DELETE FROM score_aggregates")
+    op.execute("""
+        INSERT INTO score_aggregates (id, user_id, company_id, quiz_count, score_sum, last_quiz_id, last_submission_at)
+        SELECT gen_random_uuid(), r.user_id, NULL, count(*), sum(r.score),
+               (array_agg(r.quiz_id ORDER BY r.created_at DESC))[1], max(r.created_at)
+        FROM results r
+        GROUP BY r.user_id
+        UNION ALL
+        SELECT gen_random_uuid(), r.user_id, q.company_id, count(*), sum(r.score),
+               (array_agg(r.quiz_id ORDER BY r.created_at DESC))[1], max(r.created_at)
+        FROM results r
+        JOIN quizzes q ON q.id = r.quiz_id
+        GROUP BY r.user_id, q.company_id
+    """)
+
+
+def upgrade() -> None:
+    # Keep only the latest result of every user for every quiz. Older results
+    # and their answers are moved to archive tables, downgrade() restores them.
+    op.execute("""
+        CREATE TABLE results_archive AS
+        SELECT r.* FROM results r
+        WHERE EXISTS (
+            SELECT 1 FROM results newer
+            WHERE newer.user_id = r.user_id
+              AND newer.quiz_id = r.quiz_id
+              AND (newer.created_at, newer.id) > (r.created_at, r.id)
+        )
+    """)
+    op.execute("""
+        CREATE TABLE user_answer_archive AS
+        SELECT ua.* FROM user_answer ua
+        JOIN results_archive ra ON ra.id = ua.result_id
+    """)
+    op.execute("DELETE FROM results r USING results_archive ra WHERE ra.id = r.id")
+    refresh_score_aggregates()
+    with op.get_context().autocommit_block():
+        op.create_index('_results_user_quiz_uc', 'results', ['user_id', 'quiz_id'], unique=True,
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.execute("ALTER TABLE results ADD CONSTRAINT _results_user_quiz_uc UNIQUE USING INDEX _results_user_quiz_uc")
+        op.drop_index('ix_results_user_id_quiz_id', table_name='results',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_results_user_id_quiz_id', 'results', ['user_id', 'quiz_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+    op.drop_constraint('_results_user_quiz_uc', 'results', type_='unique')
+    # Archived rows whose user, quiz or answers were deleted since cannot come back
+    op.execute("""
+        INSERT INTO results
+        SELECT ra.* FROM results_archive ra
+        WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = ra.user_id)
+          AND EXISTS (SELECT 1 FROM quizzes q WHERE q.id = ra.quiz_id)
+    """)
+    op.execute("""
+        INSERT INTO user_answer
+        SELECT uaa.* FROM user_answer_archive uaa
+        WHERE EXISTS (SELECT 1 FROM results r WHERE r.id = uaa.result_id)
+          AND EXISTS (SELECT 1 FROM questions q WHERE q.id = uaa.question_id)
+          AND EXISTS (SELECT 1 FROM answers a WHERE a.id = uaa.answer_id)
+    """)
+    op.drop_table('user_answer_archive')
+    op.drop_table('results_archive')
+    refresh_score_aggregates()
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from uuid import UUID
+from app.core.config import Settings
+from app.db.connect_redis import RedisClient
+from app.utils import serializers
+
+
+settings = Settings()
+
+TOKEN_CACHE_KEY = "auth_token:{token_hash}"
+USER_TOKENS_KEY = "auth_user_tokens:{user_id}"
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TokenCache:
+    def __init__(self, max_size: int, ttl_seconds: int, redis_enabled: bool = False):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.redis_enabled = redis_enabled
+        self._entries = OrderedDict()
+
+    async def get(self, token_hash: str):
+        entry = self._entries.get(token_hash)
+        if entry:
+            expires_at, cached = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(token_hash)
+                return cached
+            self._entries.pop(token_hash, None)
+
+        if not self.redis_enabled:
+            return None
+        try:
+            redis = await RedisClient().get_redis()
+            data = await redis.get(TOKEN_CACHE_KEY.format(token_hash=token_hash))
+        except Exception as e:
+            logging.warning(f"Token cache Redis lookup failed: {e}")
+            return None
+        if not data:
+            return None
+        cached = serializers.loads(data)
+        self._set_local(token_hash, cached, self._expires_at(cached['claims']))
+        return cached
+
+    async def set(self, token_hash: str, claims: dict, user: dict):
+        expires_at = self._expires_at(claims)
+        cached = {"claims": claims, "user": user}
+        self._set_local(token_hash, cached, expires_at)
+
+        if not self.redis_enabled:
+            return
+        ttl = int(min(expires_at - time.time(), self.ttl_seconds))
+        if ttl <= 0:
+            return
+        user_tokens_key = USER_TOKENS_KEY.format(user_id=user['id'])
+        try:
+            redis = await RedisClient().get_redis()
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.set(TOKEN_CACHE_KEY.format(token_hash=token_hash),
+                         serializers.dumps(cached), ex=ttl)
+                pipe.sadd(user_tokens_key, token_hash)
+                pipe.expire(user_tokens_key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logging.warning(f"Token cache Redis write failed: {e}")
+
+    async def invalidate_user(self, user_id: UUID):
+        user_id = str(user_id)
+        for token_hash, (expires_at, cached) in list(self._entries.items()):
+            if cached['user']['id'] == user_id:
+                self._entries.pop(token_hash, None)
+
+        if not self.redis_enabled:
+            return
+        user_tokens_key = USER_TOKENS_KEY.format(user_id=user_id)
+        try:
+            redis = await RedisClient().get_redis()
+            token_hashes = await redis.smembers(user_tokens_key)
+            keys = [TOKEN_CACHE_KEY.format(token_hash=token_hash.decode('utf-8'))
+                    for token_hash in token_hashes]
+            await redis.delete(user_tokens_key, *keys)
+        except Exception as e:
+            logging.warning(f"Token cache Redis invalidation failed: {e}")
+
+    def _expires_at(self, claims: dict) -> float:
+        # Tokens without a numeric exp are still cached, for ttl_seconds at most
+        exp = claims.get('exp')
+        if isinstance(exp, (int, float)):
+            return exp
+        return time.time() + self.ttl_seconds
+
+    def _set_local(self, token_hash: str, cached: dict, expires_at: float):
+        expires_at = min(expires_at, time.time() + self.ttl_seconds)
+        self._entries[token_hash] = (expires_at, cached)
+        self._entries.move_to_end(token_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+token_cache = TokenCache(settings.token_cache_max_size,
+                         settings.token_cache_ttl_seconds, settings.token_cache_redis_enabled)
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from app.core.config import Settings
+from app.db.connect_redis import RedisClient
+from app.utils import serializers
+
+
+settings = Settings()
+
+PROCESSING_KEY = "{queue_key}:processing:{consumer_id}"
+CONSUMERS_KEY = "{queue_key}:consumers"
+CONSUMER_HEARTBEAT_KEY = "{queue_key}:consumer:{consumer_id}"
+CONSUMER_HEARTBEAT_SECONDS = 10
+CONSUMER_TTL_SECONDS = 30
+
+
+class BackgroundJobs:
+    """In-process queue for work that can run after the response is sent.
+
+    Jobs are registered handlers called with keyword arguments. Failed jobs are
+    retried with exponential backoff. In durable mode jobs go through a Redis
+    list, so every worker process shares the queue; the keyword arguments must
+    then be JSON serializable. A worker moves each job into its own processing
+    list and removes it only once the job is done, and a process whose
+    heartbeat expired gets its processing list moved back to the queue, so
+    jobs survive a crash. Jobs for the same key may still run out of order,
+    handlers that overwrite state have to check a version themselves.
+    """
+
+    def __init__(self, workers: int, max_retries: int, retry_backoff_seconds: float,
+                 durable: bool = False, queue_key: str = "background_jobs"):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.durable = durable
+        self.queue_key = queue_key
+        self.consumer_id = uuid.uuid4().hex
+        self.processing_key = PROCESSING_KEY.format(
+            queue_key=queue_key, consumer_id=self.consumer_id)
+        self.handlers: Dict[str, Callable[..., Awaitable]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._retry_tasks = {}
+        self.stats = {
+            "enqueued": 0,
+            "completed": 0,
+            "retried": 0,
+            "failed": 0,
+            "in_flight": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0,
+            "run_seconds_max": 0.0
+        }
+
+    def register(self, name: str):
+        def decorator(handler: Callable[..., Awaitable]):
+            self.handlers[name] = handler
+            return handler
+        return decorator
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker())
+                       for _ in range(self.workers)]
+        if self.durable:
+            await self._heartbeat()
+            self._tasks.append(asyncio.create_task(self._keep_alive()))
+
+    async def stop(self):
+        if not self.durable and self._queue is not None:
+            try:
+                await asyncio.wait_for(self._drain(), settings.background_jobs_shutdown_timeout)
+            except asyncio.TimeoutError:
+                logging.warning(
+                    f"Background jobs stopped with {self._queue.qsize()} jobs still queued")
+        pending_retries = list(self._retry_tasks.values())
+        for task in self._tasks + list(self._retry_tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_tasks, return_exceptions=True)
+        self._tasks = []
+        self._retry_tasks.clear()
+        if self.durable:
+            await self._release(pending_retries)
+
+    async def _release(self, pending_retries: list):
+        # Hand everything this process still holds back to the shared queue
+        try:
+            redis = await RedisClient().get_redis()
+            for job, raw in pending_retries:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.lpush(self.queue_key, serializers.dumps(job))
+                    if raw is not None:
+                        pipe.lrem(self.processing_key, 1, raw)
+                    await pipe.execute()
+            while not self._queue.empty():
+                await redis.lpush(self.queue_key, serializers.dumps(self._queue.get_nowait()))
+            await self._requeue(redis, self.consumer_id)
+        except Exception as e:
+            logging.error(f"Background jobs could not be returned to Redis: {e}")
+
+    async def _heartbeat(self):
+        try:
+            redis = await RedisClient().get_redis()
+            await redis.sadd(CONSUMERS_KEY.format(queue_key=self.queue_key), self.consumer_id)
+            await redis.set(CONSUMER_HEARTBEAT_KEY.format(queue_key=self.queue_key, consumer_id=self.consumer_id), 1, ex=CONSUMER_TTL_SECONDS)
+            for consumer_id in await redis.smembers(CONSUMERS_KEY.format(queue_key=self.queue_key)):
+                consumer_id = consumer_id.decode('utf-8')
+                if not await redis.exists(CONSUMER_HEARTBEAT_KEY.format(queue_key=self.queue_key, consumer_id=consumer_id)):
+                    logging.warning(f"Background jobs recovering jobs of stopped consumer {consumer_id}")
+                    await self._requeue(redis, consumer_id)
+        except Exception as e:
+            logging.warning(f"Background jobs heartbeat failed: {e}")
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(CONSUMER_HEARTBEAT_SECONDS)
+            await self._heartbeat()
+
+    async def _requeue(self, redis, consumer_id: str):
+        processing_key = PROCESSING_KEY.format(
+            queue_key=self.queue_key, consumer_id=consumer_id)
+        while await redis.rpoplpush(processing_key, self.queue_key):
+            pass
+        await redis.srem(CONSUMERS_KEY.format(queue_key=self.queue_key), consumer_id)
+        await redis.delete(CONSUMER_HEARTBEAT_KEY.format(queue_key=self.queue_key, consumer_id=consumer_id))
+
+    async def _drain(self):
+        while True:
+            await self._queue.join()
+            if not self._retry_tasks:
+                return
+            await asyncio.gather(*self._retry_tasks, return_exceptions=True)
+
+    async def enqueue(self, name: str, **kwargs):
+        job = {"name": name, "kwargs": kwargs,
+               "attempt": 0, "enqueued_at": time.time()}
+        self.stats["enqueued"] += 1
+        if not self.running:
+            # Without workers (e.g. no lifespan) the job still has to happen
+            await self._run(job)
+            return
+        await self._push(job)
+
+    async def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        finished = stats["completed"] + stats["failed"]
+        stats["workers"] = len(self._tasks)
+        stats["durable"] = self.durable
+        stats["queue_depth"] = self._queue.qsize() if self._queue else 0
+        if self.durable:
+            try:
+                redis = await RedisClient().get_redis()
+                stats["queue_depth"] += await redis.llen(self.queue_key)
+            except Exception as e:
+                logging.warning(f"Background jobs queue depth lookup failed: {e}")
+        stats["queue_wait_seconds_avg"] = stats["queue_wait_seconds_total"] / finished if finished else 0.0
+        stats["run_seconds_avg"] = stats["run_seconds_total"] / finished if finished else 0.0
+        return stats
+
+    async def _push(self, job: dict):
+        if self.durable:
+            try:
+                redis = await RedisClient().get_redis()
+                await redis.lpush(self.queue_key, serializers.dumps(job))
+                return
+            except Exception as e:
+                logging.warning(f"Background job {job['name']} kept in process, Redis push failed: {e}")
+        self._queue.put_nowait(job)
+
+    async def _next_job(self) -> Tuple[dict, Optional[bytes]]:
+        if not self.durable:
+            return await self._queue.get(), None
+        while True:
+            if not self._queue.empty():
+                return self._queue.get_nowait(), None
+            try:
+                redis = await RedisClient().get_redis()
+                # The job stays in our processing list until _ack() removes it
+                raw = await redis.brpoplpush(self.queue_key, self.processing_key, timeout=1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Background jobs Redis pop failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            if raw:
+                return serializers.loads(raw), raw
+
+    async def _ack(self, raw: Optional[bytes]):
+        if raw is None:
+            return
+        try:
+            redis = await RedisClient().get_redis()
+            await redis.lrem(self.processing_key, 1, raw)
+        except Exception as e:
+            logging.warning(f"Background jobs Redis ack failed: {e}")
+
+    async def _worker(self):
+        while True:
+            job, raw = await self._next_job()
+            try:
+                await self._run(job, raw)
+            finally:
+                if not self.durable:
+                    self._queue.task_done()
+
+    async def _run(self, job: dict, raw: Optional[bytes] = None):
+        handler = self.handlers.get(job["name"])
+        if handler is None:
+            self.stats["failed"] += 1
+            logging.error(f"Background job {job['name']} has no handler")
+            await self._ack(raw)
+            return
+
+        started_at = time.time()
+        queue_wait = started_at - job["enqueued_at"]
+        self.stats["in_flight"] += 1
+        try:
+            await handler(**job["kwargs"])
+        except Exception as e:
+            job["attempt"] += 1
+            if job["attempt"] > self.max_retries:
+                self.stats["failed"] += 1
+                logging.error(
+                    f"Background job {job['name']} failed after {job['attempt']} attempts: {e}")
+            else:
+                self.stats["retried"] += 1
+                delay = self.retry_backoff_seconds * 2 ** (job["attempt"] - 1)
+                logging.warning(
+                    f"Background job {job['name']} failed, retrying in {delay}s: {e}")
+                self._schedule_retry(job, delay, raw)
+                return
+        else:
+            self.stats["completed"] += 1
+        finally:
+            self.stats["in_flight"] -= 1
+        await self._ack(raw)
+        run_time = time.time() - started_at
+        self.stats["queue_wait_seconds_total"] += queue_wait
+        self.stats["queue_wait_seconds_max"] = max(self.stats["queue_wait_seconds_max"], queue_wait)
+        self.stats["run_seconds_total"] += run_time
+        self.stats["run_seconds_max"] = max(self.stats["run_seconds_max"], run_time)
+
+    def _schedule_retry(self, job: dict, delay: float, raw: Optional[bytes] = None):
+        async def retry():
+            await asyncio.sleep(delay)
+            if self.running:
+                await self._push(job)
+                await self._ack(raw)
+            else:
+                await self._run(job, raw)
+
+        task = asyncio.create_task(retry())
+        self._retry_tasks[task] = (job, raw)
+        task.add_done_callback(lambda task: self._retry_tasks.pop(task, None))
+
+
+background_jobs = BackgroundJobs(
+    settings.background_jobs_workers,
+    settings.background_jobs_max_retries,
+    settings.background_jobs_retry_backoff_seconds,
+    settings.background_jobs_durable,
+    settings.background_jobs_queue_key
+)
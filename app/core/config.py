@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 import logging
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s', filename='app.log')
@@ -10,16 +11,51 @@ class Settings(BaseSettings):
 
     redis_host: str
     redis_port: int
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 5.0
+    redis_socket_connect_timeout: float = 5.0
+    redis_health_check_interval: int = 30
+    role_cache_max_size: int = 10000
+    role_cache_ttl_seconds: int = 300
+    quiz_cache_max_size: int = 1000
+    quiz_cache_ttl_seconds: int = 3600
 
     db_user: str
     db_password: str
     db_host: str
     db_port: int
     db_name: str
+    db_replica_host: Optional[str] = None
+    db_replica_port: Optional[int] = None
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    db_jit: bool = False
+    db_application_name: str = "fastapi_app"
+    db_stream_yield_per: int = 1000
 
     secret_key: str
     jwt_algorithm: str
     access_token_expire_minutes: int 
+    token_cache_max_size: int = 10000
+    token_cache_ttl_seconds: int = 300
+    token_cache_redis_enabled: bool = False
+
+    bcrypt_rounds: int = 12
+    password_hashing_workers: int = 4
+    password_hashing_max_queue: int = 100
+    metrics_token: Optional[str] = None
+
+    background_jobs_workers: int = 2
+    background_jobs_max_retries: int = 3
+    background_jobs_retry_backoff_seconds: float = 0.5
+    background_jobs_durable: bool = False
+    background_jobs_queue_key: str = "background_jobs"
+    background_jobs_shutdown_timeout: float = 10.0
 
     auth0_secret_key: str
     auth0_algorithm: str
@@ -10,16 +10,50 @@ settings = Settings()
 
 DATABASE_URL = f"postgresql+asyncpg://{settings.db_user}:{settings.db_password}@{settings.db_host}:{settings.db_port}/{settings.db_name}"
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+
+
+def create_engine_from_settings(database_url: str):
+    return create_async_engine(
+        database_url,
+        echo=settings.db_echo,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "server_settings": {
+                "jit": "on" if settings.db_jit else "off",
+                "application_name": settings.db_application_name
+            }
+        }
+    )
+
+
+engine = create_engine_from_settings(DATABASE_URL)
+
+if settings.db_replica_host:
+    REPLICA_DATABASE_URL = f"postgresql+asyncpg://{settings.db_user}:{settings.db_password}@{settings.db_replica_host}:{settings.db_replica_port or settings.db_port}/{settings.db_name}"
+    replica_engine = create_engine_from_settings(REPLICA_DATABASE_URL)
+else:
+    replica_engine = engine
 
 async_session = async_sessionmaker(engine, class_=AsyncSession)
 
+async_read_session = async_sessionmaker(replica_engine, class_=AsyncSession)
+
 
 async def get_session():
     async with async_session() as session:
         yield session
 
 
+async def get_read_session():
+    async with async_read_session() as session:
+        yield session
+
+
 async def check_connection():
     async with async_session() as session:
         try:
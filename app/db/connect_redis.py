@@ -1,22 +1,51 @@
 import asyncio
 from app.core.config import Settings
 import aioredis
+from app.utils import serializers
 
 
 settings = Settings()
 
+redis_pool = None
+
+
+def create_redis_pool() -> aioredis.ConnectionPool:
+    return aioredis.ConnectionPool.from_url(
+        f'redis://{settings.redis_host}:{settings.redis_port}',
+        max_connections=settings.redis_max_connections,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_connect_timeout,
+        health_check_interval=settings.redis_health_check_interval
+    )
+
+
+def get_redis_pool() -> aioredis.ConnectionPool:
+    global redis_pool
+    if redis_pool is None:
+        redis_pool = create_redis_pool()
+    return redis_pool
+
+
+async def close_redis_pool():
+    global redis_pool
+    if redis_pool is not None:
+        await redis_pool.disconnect()
+        redis_pool = None
+
 
 class RedisClient:
-    def __init__(self):
+    def __init__(self, pool: aioredis.ConnectionPool = None):
+        self._pool = pool
         self._redis = None
 
     async def connect(self):
-        self._redis = await aioredis.from_url(f'redis://{settings.redis_host}:{settings.redis_port}')
+        self._redis = aioredis.Redis(
+            connection_pool=self._pool or get_redis_pool())
 
     async def close(self):
         if self._redis:
-            self._redis.close()
-            await self._redis.wait_closed()
+            await self._redis.close()
+            self._redis = None
 
     async def get_redis(self):
         if not self._redis:
@@ -30,33 +59,24 @@ class RedisClient:
     
     async def set_data(self, key, value,expire_time=172800):
         redis = await self.get_redis()
-        await redis.set(key, value)
-        await redis.expire(key, expire_time)
+        await redis.set(key, value, ex=expire_time)
 
+    async def get_json(self, key):
+        data = await self.get_data(key)
+        return serializers.loads(data) if data else None
 
-    async def scan_iter(self, match_pattern):
-        redis = await self.get_redis()
-        cursor = '0'
-        while cursor != 0:
-            cursor, keys = await redis.scan(cursor, match=match_pattern)
-            for key in keys:
-                yield key
+    async def set_json(self, key, value, expire_time=172800):
+        await self.set_data(key, serializers.dumps(value), expire_time)
 
 
-    async def scan_iter(self, match_pattern):
-        redis = await self.get_redis()
-        cursor = '0'
-        while cursor != 0:
-            cursor, keys = await redis.scan(cursor, match=match_pattern)
-            for key in keys:
-                yield key
+async def get_redis_client() -> RedisClient:
+    return RedisClient(get_redis_pool())
 
 
 async def check_redis_connection():
     Redis_client = RedisClient()
-    await Redis_client.connect()
     redis = await Redis_client.get_redis()
-    if redis:
+    if await redis.ping():
         return f"Connected to Redis server"
 
 # Cheking if redis works
@@ -64,7 +84,6 @@ async def check_redis_connection():
 
 async def store_data_in_redis():
     Redis_client = RedisClient()
-    await Redis_client.connect()
     redis = await Redis_client.get_redis()
 
     if redis:
@@ -74,7 +93,6 @@ async def store_data_in_redis():
 
 async def retrieve_data_from_redis():
     Redis_client = RedisClient()
-    await Redis_client.connect()
     redis = await Redis_client.get_redis()
 
     if redis:
@@ -83,4 +101,3 @@ async def retrieve_data_from_redis():
             print(f"Data from Redis: {data.decode('utf-8')}")
         else:
             print("Not found")
-
@@ -0,0 +1,141 @@
+import logging
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+from app.db.connect_redis import RedisClient
+
+
+LEADERBOARD_QUIZ_KEY = "lb:quiz:{quiz_id}"
+LEADERBOARD_COMPANY_KEY = "lb:company:{company_id}"
+LEADERBOARD_GLOBAL_KEY = "lb:global"
+
+
+class Leaderboards:
+    """Sorted sets of user scores, highest first.
+
+    lb:quiz:{id} holds each user's score on the quiz, lb:company:{id} and
+    lb:global hold average marks. They are kept up to date on submit and can be
+    rebuilt from the database with app.scripts.rebuild_leaderboards.
+    """
+
+    async def record_submission(self, user_id: UUID, quiz_id: UUID, company_id: UUID, score: float, avarage_mark: float, company_avarage_mark: float):
+        redis = await RedisClient().get_redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(LEADERBOARD_QUIZ_KEY.format(quiz_id=quiz_id), {str(user_id): score})
+            pipe.zadd(LEADERBOARD_COMPANY_KEY.format(company_id=company_id), {str(user_id): company_avarage_mark})
+            pipe.zadd(LEADERBOARD_GLOBAL_KEY, {str(user_id): avarage_mark})
+            await pipe.execute()
+
+    async def sync_user_avarage_marks(self, user_ids: List[UUID], avarage_marks: List[dict], company_id: UUID = None):
+        """Re-apply users' averages after results were deleted.
+
+        Users without an aggregate row anymore are removed from the global board
+        and, when company_id is given, from that company's board. Only users
+        already on a board are updated, so deleted users and former members
+        are not added back.
+        """
+        if not user_ids:
+            return
+        global_marks = {str(row['user_id']): row['avarage_mark']
+                        for row in avarage_marks if row['company_id'] is None}
+        try:
+            redis = await RedisClient().get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                for row in avarage_marks:
+                    if row['company_id'] is not None:
+                        pipe.zadd(LEADERBOARD_COMPANY_KEY.format(company_id=row['company_id']),
+                                  {str(row['user_id']): row['avarage_mark']}, xx=True)
+                if global_marks:
+                    pipe.zadd(LEADERBOARD_GLOBAL_KEY, global_marks, xx=True)
+                removed = [str(user_id) for user_id in user_ids
+                           if str(user_id) not in global_marks]
+                if removed:
+                    pipe.zrem(LEADERBOARD_GLOBAL_KEY, *removed)
+                if company_id is not None:
+                    company_members = {str(row['user_id']) for row in avarage_marks
+                                       if row['company_id'] == company_id}
+                    removed = [str(user_id) for user_id in user_ids
+                               if str(user_id) not in company_members]
+                    if removed:
+                        pipe.zrem(LEADERBOARD_COMPANY_KEY.format(company_id=company_id), *removed)
+                await pipe.execute()
+        except Exception as e:
+            logging.error(f"Leaderboard sync failed, rebuild the leaderboards: {e}")
+
+    async def remove_quiz(self, quiz_id: UUID):
+        await self._delete(LEADERBOARD_QUIZ_KEY.format(quiz_id=quiz_id))
+
+    async def remove_company(self, company_id: UUID, quiz_ids: List[UUID]):
+        await self._delete(LEADERBOARD_COMPANY_KEY.format(company_id=company_id),
+                           *[LEADERBOARD_QUIZ_KEY.format(quiz_id=quiz_id) for quiz_id in quiz_ids])
+
+    async def remove_user(self, user_id: UUID, company_ids: Iterable[UUID], quiz_ids: Iterable[UUID]):
+        await self._remove(user_id, LEADERBOARD_GLOBAL_KEY,
+                           *[LEADERBOARD_COMPANY_KEY.format(company_id=company_id) for company_id in company_ids],
+                           *[LEADERBOARD_QUIZ_KEY.format(quiz_id=quiz_id) for quiz_id in quiz_ids])
+
+    async def remove_member(self, company_id: UUID, user_id: UUID):
+        await self._remove(user_id, LEADERBOARD_COMPANY_KEY.format(company_id=company_id))
+
+    async def top(self, key: str, limit: int) -> List[dict]:
+        redis = await RedisClient().get_redis()
+        entries = await redis.zrevrange(key, 0, limit - 1, withscores=True)
+        return self._entries(entries, 0)
+
+    async def get_rank(self, key: str, user_id: UUID, neighbours: int) -> Optional[dict]:
+        redis = await RedisClient().get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(key, str(user_id))
+            pipe.zscore(key, str(user_id))
+            rank, score = await pipe.execute()
+        if rank is None:
+            return None
+        start = max(rank - neighbours, 0)
+        entries = await redis.zrevrange(key, start, rank + neighbours, withscores=True)
+        return {"user_id": user_id, "rank": rank + 1, "score": score,
+                "neighbours": self._entries(entries, start)}
+
+    async def begin_rebuild(self, key: str):
+        """Rebuilds fill a temporary key that is swapped in, so readers never see a partial board."""
+        redis = await RedisClient().get_redis()
+        await redis.delete(f"{key}:rebuild")
+
+    async def add_rebuild_entries(self, key: str, entries: dict):
+        redis = await RedisClient().get_redis()
+        await redis.zadd(f"{key}:rebuild", entries)
+
+    async def finish_rebuild(self, key: str):
+        redis = await RedisClient().get_redis()
+        await redis.rename(f"{key}:rebuild", key)
+
+    async def delete(self, key: str):
+        redis = await RedisClient().get_redis()
+        await redis.delete(key)
+
+    async def keys(self, pattern: str) -> List[str]:
+        redis = await RedisClient().get_redis()
+        return [key.decode('utf-8') async for key in redis.scan_iter(match=pattern)
+                if not key.endswith(b":rebuild")]
+
+    async def _delete(self, *keys: str):
+        try:
+            redis = await RedisClient().get_redis()
+            await redis.delete(*keys)
+        except Exception as e:
+            logging.error(f"Leaderboard {', '.join(keys)} removal failed: {e}")
+
+    async def _remove(self, user_id: UUID, *keys: str):
+        try:
+            redis = await RedisClient().get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.zrem(key, str(user_id))
+                await pipe.execute()
+        except Exception as e:
+            logging.error(f"Leaderboard removal of user {user_id} failed, rebuild the leaderboards: {e}")
+
+    def _entries(self, entries: List[Tuple[bytes, float]], start: int) -> List[dict]:
+        return [{"rank": start + position + 1, "user_id": user_id.decode('utf-8'), "score": score}
+                for position, (user_id, score) in enumerate(entries)]
+
+
+leaderboards = Leaderboards()
@@ -0,0 +1,153 @@
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from uuid import UUID
+import hashlib
+from app.core.config import Settings
+from app.db.connect_redis import RedisClient
+from app.utils import serializers
+from app.schemas.quiz_shemas import QuizResponseSchema, QuestionListSchema
+
+
+settings = Settings()
+
+QUIZ_VERSION_KEY = "quiz_version:{quiz_id}"
+QUIZ_DEFINITION_KEY = "quiz_definition_v2:{quiz_id}:{version}"
+
+
+def make_etag(content: bytes) -> str:
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def build_quiz_definition(quiz: QuizResponseSchema, answer_key: dict) -> dict:
+    quiz_json = quiz.model_dump_json().encode('utf-8')
+    questions_json = QuestionListSchema(
+        questions=quiz.questions).model_dump_json().encode('utf-8')
+    return {
+        "quiz": quiz,
+        "quiz_json": quiz_json,
+        "quiz_etag": make_etag(quiz_json),
+        "questions_json": questions_json,
+        "questions_etag": make_etag(questions_json),
+        "answer_key": answer_key
+    }
+
+
+def get_quiz_schema(quiz_definition: dict) -> QuizResponseSchema:
+    if quiz_definition['quiz'] is None:
+        quiz_definition['quiz'] = QuizResponseSchema.model_validate_json(
+            quiz_definition['quiz_json'])
+    return quiz_definition['quiz']
+
+
+class QuizCache:
+    """Versioned cache of assembled quizzes, their JSON bytes and answer keys.
+
+    Every entry is stored under the quiz's current version, which the write
+    paths replace with bump_version(), so a stale definition is never read.
+    Versions are random tokens rather than counters, so a version lost to a
+    Redis flush or eviction is never handed out again. Local entries expire
+    after ttl_seconds like the Redis ones. When the version cannot be read
+    from Redis the cache is bypassed.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+    async def get_version(self, quiz_id: UUID) -> Optional[str]:
+        key = QUIZ_VERSION_KEY.format(quiz_id=quiz_id)
+        try:
+            redis = await RedisClient().get_redis()
+            version = await redis.get(key)
+            if not version:
+                await redis.set(key, uuid.uuid4().hex, nx=True)
+                version = await redis.get(key)
+        except Exception as e:
+            logging.warning(f"Quiz cache version lookup failed: {e}")
+            return None
+        return version.decode('utf-8') if version else None
+
+    async def bump_version(self, quiz_id: UUID):
+        self.evict_local(quiz_id)
+        try:
+            redis = await RedisClient().get_redis()
+            await redis.set(QUIZ_VERSION_KEY.format(quiz_id=quiz_id), uuid.uuid4().hex)
+        except Exception as e:
+            logging.error(f"Quiz cache version bump failed for quiz {quiz_id}: {e}")
+
+    async def get(self, quiz_id: UUID, version: str) -> Optional[dict]:
+        entry = self._entries.get((quiz_id, version))
+        if entry and entry[0] > time.time():
+            self._entries.move_to_end((quiz_id, version))
+            return entry[1]
+
+        try:
+            redis = await RedisClient().get_redis()
+            data = await redis.get(QUIZ_DEFINITION_KEY.format(quiz_id=quiz_id, version=version))
+        except Exception as e:
+            logging.warning(f"Quiz cache Redis lookup failed: {e}")
+            return None
+        if not data:
+            return None
+        entry = self._deserialize(serializers.loads(data))
+        self._set_local(quiz_id, version, entry)
+        return entry
+
+    async def set(self, quiz_id: UUID, version: str, entry: dict):
+        self._set_local(quiz_id, version, entry)
+        try:
+            redis = await RedisClient().get_redis()
+            await redis.set(QUIZ_DEFINITION_KEY.format(quiz_id=quiz_id, version=version), serializers.dumps(self._serialize(entry)), ex=self.ttl_seconds)
+        except Exception as e:
+            logging.warning(f"Quiz cache Redis write failed: {e}")
+
+    def evict_local(self, quiz_id: UUID):
+        for key in list(self._entries):
+            if key[0] == quiz_id:
+                self._entries.pop(key, None)
+
+    def _set_local(self, quiz_id: UUID, version: str, entry: dict):
+        self._entries[(quiz_id, version)] = (time.time() + self.ttl_seconds, entry)
+        self._entries.move_to_end((quiz_id, version))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _serialize(self, entry: dict) -> dict:
+        answer_key = entry['answer_key']
+        return {
+            "quiz_json": entry['quiz_json'].decode('utf-8'),
+            "quiz_etag": entry['quiz_etag'],
+            "questions_json": entry['questions_json'].decode('utf-8'),
+            "questions_etag": entry['questions_etag'],
+            "answer_key": {
+                "quiz_id": answer_key['quiz_id'],
+                "company_id": answer_key['company_id'],
+                "frequency_days": answer_key['frequency_days'],
+                "correct_answers": answer_key['correct_answers']
+            }
+        }
+
+    def _deserialize(self, data: dict) -> dict:
+        answer_key = data['answer_key']
+        return {
+            "quiz": None,
+            "quiz_json": data['quiz_json'].encode('utf-8'),
+            "quiz_etag": data['quiz_etag'],
+            "questions_json": data['questions_json'].encode('utf-8'),
+            "questions_etag": data['questions_etag'],
+            "answer_key": {
+                "quiz_id": UUID(answer_key['quiz_id']),
+                "company_id": UUID(answer_key['company_id']),
+                "frequency_days": answer_key['frequency_days'],
+                "correct_answers": {UUID(question_id): {UUID(answer_id) for answer_id in answer_ids}
+                                    for question_id, answer_ids in answer_key['correct_answers'].items()}
+            }
+        }
+
+
+quiz_cache = QuizCache(settings.quiz_cache_max_size,
+                       settings.quiz_cache_ttl_seconds)
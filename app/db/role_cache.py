@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+from app.core.config import Settings
+from app.db.connect_redis import RedisClient
+from app.db.user_models import Role
+
+
+settings = Settings()
+
+ROLE_CACHE_KEY = "company_roles:{company_id}"
+ROLE_GENERATION_KEY = "company_roles_generation:{company_id}"
+ROLE_GENERATION_TTL_SECONDS = 86400
+ROLE_INVALIDATION_CHANNEL = "company_roles:invalidate"
+NOT_MEMBER = "none"
+
+# Writes fields only if no invalidation happened since the caller read the
+# generation. The hash TTL is set once, each field carries its own expiry.
+SET_IF_GENERATION_SCRIPT = """
+local generation = redis.call('GET', KEYS[2]) or ''
+if generation ~= ARGV[1] then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+
+class RoleCache:
+    """Cross-worker cache of (user_id, company_id) -> Role.
+
+    Roles live in a Redis hash per company and in a small local LRU.
+    Membership writes call invalidate(), which drops the Redis field, bumps
+    the company generation and broadcasts over pub/sub so every worker evicts
+    its local copy. Loaders read the generations before querying the database
+    and pass them to set_many(), so a write-back racing an invalidation is
+    dropped instead of caching the old role.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    async def get_many(self, pairs: Iterable[Tuple[UUID, UUID]]) -> Dict[Tuple[UUID, UUID], Optional[Role]]:
+        found = {}
+        missing = []
+        now = time.time()
+        for pair in pairs:
+            entry = self._entries.get(pair)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(pair)
+                found[pair] = entry[1]
+            else:
+                missing.append(pair)
+        if not missing:
+            return found
+
+        local_generations = self.get_local_generations(
+            company_id for _, company_id in missing)
+        try:
+            redis = await RedisClient().get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                for user_id, company_id in missing:
+                    pipe.hget(ROLE_CACHE_KEY.format(
+                        company_id=company_id), str(user_id))
+                values = await pipe.execute()
+        except Exception as e:
+            logging.warning(f"Role cache Redis lookup failed: {e}")
+            return found
+
+        now = time.time()
+        for pair, value in zip(missing, values):
+            if value is None:
+                continue
+            value, _, expires_at = value.decode('utf-8').rpartition('|')
+            try:
+                expires_at = float(expires_at)
+            except ValueError:
+                continue
+            if expires_at <= now:
+                continue
+            role = None if value == NOT_MEMBER else Role(value)
+            if self._generations.get(str(pair[1]), 0) == local_generations[str(pair[1])]:
+                self._set_local(pair, role, expires_at)
+            found[pair] = role
+        return found
+
+    def get_local_generations(self, company_ids: Iterable[UUID]) -> Dict[str, int]:
+        return {str(company_id): self._generations.get(str(company_id), 0) for company_id in company_ids}
+
+    async def get_generations(self, company_ids: Iterable[UUID]) -> Dict[str, Tuple[int, Optional[str]]]:
+        """Return {company_id: (local generation, Redis generation)}.
+
+        The Redis generation is "" when no invalidation is recorded and None
+        when Redis could not be read, in which case set_many() skips Redis.
+        """
+        local_generations = self.get_local_generations(company_ids)
+        company_ids = list(local_generations)
+        try:
+            redis = await RedisClient().get_redis()
+            values = await redis.mget([ROLE_GENERATION_KEY.format(company_id=company_id) for company_id in company_ids])
+            redis_generations = [value.decode(
+                'utf-8') if value else "" for value in values]
+        except Exception as e:
+            logging.warning(f"Role cache generation lookup failed: {e}")
+            redis_generations = [None] * len(company_ids)
+        return {company_id: (local_generations[company_id], redis_generation) for company_id, redis_generation in zip(company_ids, redis_generations)}
+
+    async def set_many(self, roles: Dict[Tuple[UUID, UUID], Optional[Role]], generations: Dict[str, Tuple[int, Optional[str]]]):
+        if not roles:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        fields_by_company = {}
+        for pair, role in roles.items():
+            company_id = str(pair[1])
+            local_generation, _ = generations[company_id]
+            if self._generations.get(company_id, 0) == local_generation:
+                self._set_local(pair, role, expires_at)
+            fields_by_company.setdefault(company_id, []).extend(
+                [str(pair[0]), f"{role.value if role else NOT_MEMBER}|{expires_at}"])
+
+        try:
+            redis = await RedisClient().get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                for company_id, fields in fields_by_company.items():
+                    _, redis_generation = generations[company_id]
+                    if redis_generation is None:
+                        continue
+                    pipe.eval(SET_IF_GENERATION_SCRIPT, 2, ROLE_CACHE_KEY.format(company_id=company_id), ROLE_GENERATION_KEY.format(
+                        company_id=company_id), redis_generation, self.ttl_seconds, *fields)
+                await pipe.execute()
+        except Exception as e:
+            logging.warning(f"Role cache Redis write failed: {e}")
+
+    async def invalidate(self, company_id: UUID, user_id: UUID = None):
+        self.evict_local(company_id, user_id)
+        key = ROLE_CACHE_KEY.format(company_id=company_id)
+        generation_key = ROLE_GENERATION_KEY.format(company_id=company_id)
+        try:
+            redis = await RedisClient().get_redis()
+            async with redis.pipeline(transaction=True) as pipe:
+                if user_id is None:
+                    pipe.delete(key)
+                else:
+                    pipe.hdel(key, str(user_id))
+                pipe.incr(generation_key)
+                pipe.expire(generation_key, ROLE_GENERATION_TTL_SECONDS)
+                pipe.publish(ROLE_INVALIDATION_CHANNEL,
+                             f"{company_id}:{user_id or '*'}")
+                await pipe.execute()
+        except Exception as e:
+            logging.warning(f"Role cache invalidation failed: {e}")
+
+    def evict_local(self, company_id: UUID, user_id: UUID = None):
+        company_id = str(company_id)
+        user_id = str(user_id) if user_id else None
+        self._generations[company_id] = self._generations.get(
+            company_id, 0) + 1
+        for pair in list(self._entries):
+            if str(pair[1]) == company_id and (user_id is None or str(pair[0]) == user_id):
+                self._entries.pop(pair, None)
+
+    async def listen(self):
+        while True:
+            pubsub = None
+            try:
+                redis = await RedisClient().get_redis()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(ROLE_INVALIDATION_CHANNEL)
+                while True:
+                    # Polling stays below the pool's socket_timeout, so an idle
+                    # channel is not mistaken for a broken connection
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if not message or message['type'] != 'message':
+                        continue
+                    company_id, user_id = message['data'].decode(
+                        'utf-8').split(':')
+                    self.evict_local(
+                        company_id, None if user_id == '*' else user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Invalidations sent while disconnected are lost, drop local copies
+                logging.warning(f"Role cache listener error: {e}")
+                self._entries.clear()
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    await pubsub.reset()
+
+    def _set_local(self, pair: Tuple[UUID, UUID], role: Optional[Role], expires_at: float):
+        self._entries[pair] = (expires_at, role)
+        self._entries.move_to_end(pair)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+role_cache = RoleCache(settings.role_cache_max_size,
+                       settings.role_cache_ttl_seconds)
@@ -4,7 +4,7 @@ from app.db.base_models import Base
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, String, Boolean, ForeignKey, UniqueConstraint, Integer, Float, DateTime
+from sqlalchemy import Column, String, Boolean, ForeignKey, UniqueConstraint, Integer, Float, DateTime, Index, text
 import uuid
 from enum import Enum
 from sqlalchemy import Enum as EnumColumn
@@ -35,6 +35,8 @@ class Company(BaseTable):
     visible = Column(Boolean, default=True, nullable=False)
     quizzes = relationship('Quiz', back_populates='company', cascade='delete')
 
+    __table_args__ = (Index('ix_company_visible_id', 'visible', 'id'),)
+
 
 class Role(Enum):
     OWNER = 'owner'
@@ -68,6 +70,14 @@ class ActionStatus(Enum):
 class ExportType(Enum):
     CSV = 'csv'
     JSON = 'json'
+    NDJSON = 'ndjson'
+    PARQUET = 'parquet'
+    ARROW = 'arrow'
+
+
+class ExportSource(Enum):
+    POSTGRES = 'postgres'
+    REDIS = 'redis'
 
 
 class Action(BaseTable):
@@ -82,6 +92,11 @@ class Action(BaseTable):
         'Company', back_populates='actions', cascade='delete')
     user = relationship('User', back_populates='actions')
 
+    __table_args__ = (
+        Index('ix_actions_user_id_status', 'user_id', 'status'),
+        Index('ix_actions_company_id_status', 'company_id', 'status'),
+    )
+
 
 class Quiz(BaseTable):
     __tablename__ = 'quizzes'
@@ -95,6 +110,8 @@ class Quiz(BaseTable):
         'company.id', ondelete='CASCADE'), nullable=False)
     company = relationship('Company', back_populates='quizzes')
 
+    __table_args__ = (Index('ix_quizzes_company_id', 'company_id'),)
+
 
 class Question(BaseTable):
     __tablename__ = 'questions'
@@ -106,6 +123,8 @@ class Question(BaseTable):
     answers = relationship(
         'Answer', back_populates='question', cascade='delete')
 
+    __table_args__ = (Index('ix_questions_quiz_id', 'quiz_id'),)
+
 
 class Answer(BaseTable):
     __tablename__ = 'answers'
@@ -116,6 +135,9 @@ class Answer(BaseTable):
         'questions.id', ondelete='CASCADE'), nullable=False)
     question = relationship('Question', back_populates='answers')
 
+    __table_args__ = (Index('ix_answers_question_id', 'question_id',
+                            postgresql_include=['is_correct']),)
+
 
 class Result(BaseTable):
     __tablename__ = 'results'
@@ -129,6 +151,11 @@ class Result(BaseTable):
     quiz = relationship('Quiz')
     user = relationship('User')
 
+    __table_args__ = (
+        UniqueConstraint('user_id', 'quiz_id', name='_results_user_quiz_uc'),
+        Index('ix_results_user_id_created_at', 'user_id', text('created_at DESC')),
+    )
+
 
 class UserAnswer(BaseTable):
     __tablename__ = 'user_answer'
@@ -142,3 +169,26 @@ class UserAnswer(BaseTable):
     result = relationship('Result')
     question = relationship('Question')
     answer = relationship('Answer')
+
+    __table_args__ = (Index('ix_user_answer_result_id', 'result_id'),)
+
+
+class ScoreAggregate(BaseTable):
+    __tablename__ = 'score_aggregates'
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey(
+        'users.id', ondelete='CASCADE'), nullable=False)
+    company_id = Column(UUID(as_uuid=True), ForeignKey(
+        'company.id', ondelete='CASCADE'), nullable=True)
+    quiz_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
+    last_quiz_id = Column(UUID(as_uuid=True), ForeignKey(
+        'quizzes.id', ondelete='SET NULL'), nullable=True)
+    last_submission_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('_score_aggregates_user_uc', 'user_id', unique=True,
+              postgresql_where=text('company_id IS NULL')),
+        Index('_score_aggregates_user_company_uc', 'user_id', 'company_id', unique=True,
+              postgresql_where=text('company_id IS NOT NULL')),
+    )
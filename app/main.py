@@ -1,20 +1,48 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager, suppress
+import asyncio
 
 from app.routers.health_check_route import health_check_router
 from app.routers.user_routes import user_router
 from app.routers.company_routes import company_router
 from app.routers.quiz_routes import quiz_router
+from app.routers.leaderboard_routes import leaderboard_router
 from app.core.config import Settings
+from app.db.connect_redis import get_redis_pool, close_redis_pool
+from app.db.connect_postgresql import engine, replica_engine
+from app.db.role_cache import role_cache
+from app.core.background_jobs import background_jobs
 from fastapi.middleware.cors import CORSMiddleware
 
 settings = Settings()
 
-app = FastAPI(debug=settings.debug)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_redis_pool()
+    role_cache_listener = asyncio.create_task(role_cache.listen())
+    await background_jobs.start()
+    yield
+    await background_jobs.stop()
+    role_cache_listener.cancel()
+    # Let the listener release its pubsub connection before the pool closes
+    with suppress(asyncio.CancelledError):
+        await role_cache_listener
+    await close_redis_pool()
+    await engine.dispose()
+    if replica_engine is not engine:
+        await replica_engine.dispose()
+
+
+app = FastAPI(debug=settings.debug, lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 app.include_router(health_check_router,tags=["Health Check"])
 app.include_router(user_router,tags=["User"])
 app.include_router(company_router,tags=["Company"])
 app.include_router(quiz_router,tags=["Quizzes"])
+app.include_router(leaderboard_router,tags=["Leaderboards"])
 
 app.add_middleware(
     CORSMiddleware,
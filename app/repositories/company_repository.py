@@ -1,23 +1,33 @@
 from app.db.user_models import Company
 from app.schemas.user_schemas import SignUpRequestSchema, UserUpdateRequestSchema, UserListSchema, UserDetailSchema
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from fastapi import HTTPException
 from sqlalchemy import select
+from app.utils.pagination import paginate_query
 from app.db.user_models import User, Role
 import logging
 from sqlalchemy.exc import DBAPIError
 from uuid import UUID
 from asyncpg.exceptions import UniqueViolationError
 from sqlalchemy.exc import IntegrityError
-from app.db.user_models import Action, ActionStatus, CompanyMember
+from app.db.user_models import Action, ActionStatus, CompanyMember, Quiz, Result
+from app.repositories.score_aggregate_repository import ScoreAggregateRepository
+from app.repositories.membership_loader import MembershipLoader
+from app.db.role_cache import role_cache
+from app.db.leaderboard import leaderboards
 from sqlalchemy.sql import text
 from sqlalchemy import delete, join
+from app.core.config import Settings
+
+
+settings = Settings()
 
 
 class CompanyRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.membership_loader = MembershipLoader(db)
 
     async def check_company(self, company_name: str) -> bool:
         company_check = await self.db.execute(select(Company).where(Company.name == company_name))
@@ -37,6 +47,7 @@ class CompanyRepository:
         self.db.add(company_owner_adding)
         await self.db.commit()
         await self.db.refresh(company_owner_adding)
+        await role_cache.invalidate(company.id, current_user_id)
         logging.info("Company created")
         return Company(**company_data)
 
@@ -53,8 +64,8 @@ class CompanyRepository:
         logging.info(f"Company found with id {company_id}")
         return company
 
-    async def get_company_list_paginated(self, page: int, limit: int) -> List[Company]:
-        companies = await self.db.execute(select(Company).where(Company.visible == True).offset((page - 1) * limit).limit(limit))
+    async def get_company_list_paginated(self, page: int, limit: int, cursor: Optional[str] = None) -> List[Company]:
+        companies = await self.db.execute(paginate_query(select(Company).where(Company.visible == True), Company.id, page, limit, cursor))
         companies = companies.scalars().all()
         if not companies:
             raise HTTPException(
@@ -64,8 +75,19 @@ class CompanyRepository:
 
     async def delete_company(self, company_id: UUID) -> None:
         company = await self.get_company_without_visability(company_id)
+        user_ids = await self.db.execute(select(Result.user_id).join(Quiz).where(Quiz.company_id == company_id).distinct())
+        user_ids = user_ids.scalars().all()
+        quiz_ids = await self.db.execute(select(Quiz.id).where(Quiz.company_id == company_id))
+        quiz_ids = quiz_ids.scalars().all()
         await self.db.delete(company)
+        await self.db.flush()
+        score_aggregate_repository = ScoreAggregateRepository(self.db)
+        await score_aggregate_repository.refresh_user_aggregates(user_ids)
         await self.db.commit()
+        await role_cache.invalidate(company_id)
+        avarage_marks = await score_aggregate_repository.get_user_avarage_marks(user_ids)
+        await leaderboards.remove_company(company_id, quiz_ids)
+        await leaderboards.sync_user_avarage_marks(user_ids, avarage_marks)
         logging.info(f"Company with id {company_id} deleted")
 
     async def update_company(self, company_id: UUID, company_data: dict) -> Company:
@@ -133,8 +155,8 @@ class CompanyRepository:
         return company_member
 
     async def check_if_user_is_member_of_company(self, company_id: UUID, user_id: UUID) -> None:
-        company_member = await self.check_if_user_is_member_of_company_for_deleting(company_id, user_id)
-        if company_member:
+        role = await self.membership_loader.get_role(user_id, company_id)
+        if role:
             raise HTTPException(
                 status_code=409, detail="User already member of company")
 
@@ -161,6 +183,7 @@ class CompanyRepository:
             self.db.add(company_member_adding)
             await self.db.commit()
             await self.db.refresh(company_member_adding)
+            await role_cache.invalidate(company_id, user_id)
             logging.info("Join request accepted")
         else:
             raise HTTPException(
@@ -177,6 +200,7 @@ class CompanyRepository:
             await self.db.commit()
             await self.db.refresh(company_member_adding)
             await self.db.refresh(action)
+            await role_cache.invalidate(company_id, user_id)
             logging.info("Invitation accepted")
         else:
             raise HTTPException(
@@ -186,6 +210,8 @@ class CompanyRepository:
         company_member = await self.get_member(company_id, user_id)
         await self.db.execute(delete(CompanyMember).where(CompanyMember.company_id == company_id).where(CompanyMember.user_id == user_id))
         await self.db.commit()
+        await role_cache.invalidate(company_id, user_id)
+        await leaderboards.remove_member(company_id, user_id)
         await self.cancel_invitation_delete(company_id, user_id)
         logging.info("User deleted from company")
 
@@ -211,6 +237,8 @@ class CompanyRepository:
         company_member = await self.get_member(company_id, current_user.id)
         await self.db.delete(company_member)
         await self.db.commit()
+        await role_cache.invalidate(company_id, current_user.id)
+        await leaderboards.remove_member(company_id, current_user.id)
         logging.info("User exited from company")
 
     async def get_invited_users(self, company_id: UUID):
@@ -245,6 +273,17 @@ class CompanyRepository:
 
         return users
 
+    async def stream_company_members(self, company_id: UUID):
+        join_members = (
+            select(User).
+            select_from(join(User, CompanyMember, User.id == CompanyMember.user_id)).
+            where(CompanyMember.company_id == company_id).
+            execution_options(yield_per=settings.db_stream_yield_per)
+        )
+        users = await self.db.stream_scalars(join_members)
+        async for user in users:
+            yield user
+
     async def get_company_members(self, company_id: UUID):
         join_members = (
             select(User).
@@ -283,18 +322,18 @@ class CompanyRepository:
 
     # be-1
     async def get_user_role_in_company(self, company_id: UUID, user_id: UUID) -> str:
-        company_member = await self.db.execute(select(CompanyMember).where(CompanyMember.company_id == company_id).where(CompanyMember.user_id == user_id))
-        company_member = company_member.scalars().first()
-        if not company_member:
+        role = await self.membership_loader.get_role(user_id, company_id)
+        if not role:
             raise HTTPException(
                 status_code=404, detail="User not member of company")
-        return company_member.role
+        return role
 
     async def promote_user_to_admin(self, company_id: UUID, user_id: UUID) -> None:
         company_member = await self.get_member(company_id, user_id)
         if company_member.role == Role.MEMBER:
             company_member.role = Role.ADMIN
             await self.db.commit()
+            await role_cache.invalidate(company_id, user_id)
             logging.info("User promoted to admin")
         else:
             raise HTTPException(
@@ -305,6 +344,7 @@ class CompanyRepository:
         if company_member.role == Role.ADMIN:
             company_member.role = Role.MEMBER
             await self.db.commit()
+            await role_cache.invalidate(company_id, user_id)
             logging.info("Admin demoted to user")
         else:
             raise HTTPException(
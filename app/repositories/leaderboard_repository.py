@@ -0,0 +1,35 @@
+from app.db.user_models import Quiz, Result, CompanyMember
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, null
+from app.core.config import Settings
+
+
+settings = Settings()
+
+
+class LeaderboardRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _stream_partitions(self, stmt):
+        results = await self.db.stream(stmt.execution_options(yield_per=settings.db_stream_yield_per))
+        async for rows in results.partitions():
+            yield rows
+
+    def stream_quiz_scores(self):
+        stmt = select(Result.quiz_id, Result.user_id, Result.score).order_by(Result.quiz_id)
+        return self._stream_partitions(stmt)
+
+    def stream_company_avarage_marks(self):
+        stmt = (
+            select(Quiz.company_id, Result.user_id, func.avg(Result.score).label('avarage_mark')).
+            join(Quiz, Quiz.id == Result.quiz_id).
+            join(CompanyMember, (CompanyMember.company_id == Quiz.company_id) & (CompanyMember.user_id == Result.user_id)).
+            group_by(Quiz.company_id, Result.user_id).
+            order_by(Quiz.company_id)
+        )
+        return self._stream_partitions(stmt)
+
+    def stream_global_avarage_marks(self):
+        stmt = select(null(), Result.user_id, func.avg(Result.score).label('avarage_mark')).group_by(Result.user_id)
+        return self._stream_partitions(stmt)
@@ -0,0 +1,73 @@
+from app.db.user_models import CompanyMember, Quiz, Question, Role
+from app.db.role_cache import role_cache
+from app.db.connect_postgresql import engine, async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_
+from typing import Iterable, Optional, Tuple
+from uuid import UUID
+
+
+class MembershipLoader:
+    """Request-scoped memo of membership roles and quiz/question -> company lookups.
+
+    Create one per request (repositories and services are built per request),
+    so every fact is read from the database at most once while handling it.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._roles = {}
+        self._quiz_companies = {}
+        self._question_companies = {}
+
+    async def load_roles(self, pairs: Iterable[Tuple[UUID, UUID]]) -> None:
+        missing = {pair for pair in pairs if pair not in self._roles}
+        if not missing:
+            return
+        cached_roles = await role_cache.get_many(missing)
+        self._roles.update(cached_roles)
+        missing -= cached_roles.keys()
+        if not missing:
+            return
+
+        generations = await role_cache.get_generations({company_id for _, company_id in missing})
+        loaded_roles = dict.fromkeys(missing)
+        stmt = select(CompanyMember.user_id, CompanyMember.company_id, CompanyMember.role).where(
+            tuple_(CompanyMember.user_id, CompanyMember.company_id).in_(list(missing)))
+        if self.db.bind is engine:
+            members = await self.db.execute(stmt)
+            members = members.all()
+        else:
+            # A lagging replica can still show a removed or demoted member, and the
+            # role would then be cached for every worker, so roles come from the primary
+            async with async_session() as session:
+                members = await session.execute(stmt)
+                members = members.all()
+        for user_id, company_id, role in members:
+            loaded_roles[(user_id, company_id)] = role
+        self._roles.update(loaded_roles)
+        await role_cache.set_many(loaded_roles, generations)
+
+    async def get_role(self, user_id: UUID, company_id: UUID) -> Optional[Role]:
+        await self.load_roles([(user_id, company_id)])
+        return self._roles[(user_id, company_id)]
+
+    def prime_quiz_company_id(self, quiz_id: UUID, company_id: UUID):
+        self._quiz_companies[quiz_id] = company_id
+
+    async def get_quiz_company_id(self, quiz_id: UUID) -> Optional[UUID]:
+        if quiz_id not in self._quiz_companies:
+            company_id = await self.db.execute(select(Quiz.company_id).where(Quiz.id == quiz_id))
+            self._quiz_companies[quiz_id] = company_id.scalars().first()
+        return self._quiz_companies[quiz_id]
+
+    async def get_question_company_id(self, question_id: UUID) -> Optional[UUID]:
+        if question_id not in self._question_companies:
+            question = await self.db.execute(select(Question.quiz_id, Quiz.company_id).join(Quiz, Quiz.id == Question.quiz_id).where(Question.id == question_id))
+            question = question.first()
+            if question:
+                self._quiz_companies[question.quiz_id] = question.company_id
+                self._question_companies[question_id] = question.company_id
+            else:
+                self._question_companies[question_id] = None
+        return self._question_companies[question_id]
@@ -1,21 +1,32 @@
 from app.db.user_models import User, Quiz, Company, Question, Answer, CompanyMember
 from app.schemas.quiz_shemas import QuizResponseSchema, QuizSchema, QuestionSchema, AnswerSchema
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from app.db.user_models import User, Role, Result, UserAnswer
+from app.repositories.score_aggregate_repository import ScoreAggregateRepository
+from app.repositories.membership_loader import MembershipLoader
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import literal_column, Boolean
+from app.utils.pagination import paginate_query
+from app.db.leaderboard import leaderboards
 import logging
 from sqlalchemy.exc import DBAPIError
 from uuid import UUID
 from sqlalchemy.orm import joinedload
 from sqlalchemy import and_
 from datetime import datetime
+from app.core.config import Settings
+
+
+settings = Settings()
 
 
 class QuizRepository:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, membership_loader: MembershipLoader = None):
         self.db = db
+        self.membership_loader = membership_loader or MembershipLoader(db)
 
     async def get_quiz_by_id(self, quiz_id: UUID) -> Quiz:
         stmt = select(Quiz).where(Quiz.id == quiz_id)
@@ -26,14 +37,6 @@ class QuizRepository:
         quiz_dict = quiz.__dict__
         return quiz_dict
 
-    async def get_quiz_questions(self, quiz_id: UUID):
-        stmt = select(Question).where(Question.quiz_id ==
-                                      quiz_id).options(joinedload(Question.answers))
-        result = await self.db.execute(stmt)
-        questions = result.scalars().unique().all()
-        questions_dict = [question.__dict__ for question in questions]
-        return questions_dict
-
     async def get_quiz_questions_ids(self, quiz_id: UUID) -> List[UUID]:
         stmt = select(Question).where(Question.quiz_id ==
                                       quiz_id).options(joinedload(Question.answers))
@@ -63,44 +66,30 @@ class QuizRepository:
         return answers_ids
 
     async def check_if_user_is_owner_or_admin_in_this_quiz_company_by_quiz_id(self, current_user_id: UUID, quiz_id: UUID):
-        quiz_select = select(Quiz).where(Quiz.id == quiz_id)
-        result = await self.db.execute(quiz_select)
-        quiz = result.scalars().first()
-
-        if not quiz:
+        company_id = await self.membership_loader.get_quiz_company_id(quiz_id)
+        if not company_id:
             raise HTTPException(status_code=404, detail="quiz not found")
 
-        company_member_select = select(CompanyMember).where(and_(
-            CompanyMember.user_id == current_user_id, CompanyMember.company_id == quiz.company_id))
-        result = await self.db.execute(company_member_select)
-        company_member = result.scalars().first()
-        if not company_member:
+        role = await self.membership_loader.get_role(current_user_id, company_id)
+        if not role:
             raise HTTPException(
                 status_code=403, detail='You are not member of company with this quiz, you are not permitted to see this)')
 
-        if company_member.role != Role.ADMIN and company_member.role != Role.OWNER:
+        if role != Role.ADMIN and role != Role.OWNER:
             raise HTTPException(
                 status_code=403, detail='You are not owner or admin of company with this quiz, you are not permitted to see this)')
 
     async def check_if_user_is_owner_or_admin_in_this_quiz_company(self, current_user_id: UUID, question_id: UUID):
-        question_select = select(Question).where(Question.id == question_id)
-        result = await self.db.execute(question_select)
-        question = result.scalars().first()
-        if not question:
+        company_id = await self.membership_loader.get_question_company_id(question_id)
+        if not company_id:
             raise HTTPException(status_code=404, detail="question not found")
 
-        quiz = question.quiz
-        if not quiz:
-            raise HTTPException(status_code=404, detail="quiz not found")
-        company_member_select = select(CompanyMember).where(and_(
-            CompanyMember.user_id == current_user_id, CompanyMember.company_id == quiz.company_id))
-        result = await self.db.execute(company_member_select)
-        company_member = result.scalars().first()
-        if not company_member:
+        role = await self.membership_loader.get_role(current_user_id, company_id)
+        if not role:
             raise HTTPException(
                 status_code=403, detail='You are not member of company with this quiz question, you are not permitted to see this)')
 
-        if company_member.role != Role.ADMIN and company_member.role != Role.OWNER:
+        if role != Role.ADMIN and role != Role.OWNER:
             raise HTTPException(
                 status_code=403, detail='You are not owner or admin of company with this quiz question, you are not permitted to see this)')
 
@@ -137,15 +126,14 @@ class QuizRepository:
         return quiz_dict
 
     async def check_if_user_is_admin_or_owner_in_company(self, current_user_id: UUID, company_id: UUID):
-        company_member = await self.db.execute(select(CompanyMember).where(CompanyMember.company_id == company_id).where(CompanyMember.user_id == current_user_id))
-        company_member = company_member.scalars().first()
-        if not company_member:
+        role = await self.membership_loader.get_role(current_user_id, company_id)
+        if not role:
             raise HTTPException(
                 status_code=403, detail="You are not a member of this company")
-        if company_member.role != Role.ADMIN and company_member.role != Role.OWNER:
+        if role != Role.ADMIN and role != Role.OWNER:
             raise HTTPException(
                 status_code=403, detail="You are not an admin or owner in this company")
-        return company_member
+        return role
 
     async def delete_quiz(self, quiz_id: UUID):
         quiz_select = select(Quiz).where(Quiz.id == quiz_id)
@@ -153,8 +141,17 @@ class QuizRepository:
         quiz = result.scalars().first()
         if not quiz:
             raise HTTPException(status_code=404, detail="Quiz not found")
+        company_id = quiz.company_id
+        user_ids = await self.db.execute(select(Result.user_id).where(Result.quiz_id == quiz_id).distinct())
+        user_ids = user_ids.scalars().all()
         await self.db.delete(quiz)
+        await self.db.flush()
+        score_aggregate_repository = ScoreAggregateRepository(self.db)
+        await score_aggregate_repository.refresh_user_aggregates(user_ids)
         await self.db.commit()
+        avarage_marks = await score_aggregate_repository.get_user_avarage_marks(user_ids)
+        await leaderboards.remove_quiz(quiz_id)
+        await leaderboards.sync_user_avarage_marks(user_ids, avarage_marks, company_id)
         return "Quiz deleted"
 
     async def update_quiz(self, quiz_id: UUID, quiz_data: dict):
@@ -208,16 +205,14 @@ class QuizRepository:
         quiz_dict = quiz.__dict__
         return quiz_dict
 
-    async def list_quizzes(self, company_id: UUID, page: int, limit: int):
-        quizzes = await self.db.execute(select(Quiz).where(Quiz.company_id == company_id).offset((page - 1) * limit).limit(limit))
+    async def list_quizzes(self, company_id: UUID, page: int, limit: int, cursor: Optional[str] = None):
+        quizzes = await self.db.execute(paginate_query(select(Quiz).where(Quiz.company_id == company_id), Quiz.id, page, limit, cursor))
         quizzes = quizzes.scalars().all()
-        quizzes_dict = [quiz.__dict__ for quiz in quizzes]
-        return quizzes_dict
+        return quizzes
 
     async def check_if_user_member_of_company(self, current_user_id: UUID, company_id: UUID):
-        company_member = await self.db.execute(select(CompanyMember).where(CompanyMember.company_id == company_id).where(CompanyMember.user_id == current_user_id))
-        company_member = company_member.scalars().first()
-        if not company_member:
+        role = await self.membership_loader.get_role(current_user_id, company_id)
+        if not role:
             raise HTTPException(
                 status_code=403, detail="You are not a member of this company")
 
@@ -227,56 +222,59 @@ class QuizRepository:
         result = result.scalars().first()
         return result
 
-    async def check_if_quiz_exists(self, quiz_id: UUID) -> None:
-        result = await self.db.execute(select(Quiz).where(Quiz.id == quiz_id))
-        quiz = result.scalars().first()
+    async def get_quiz_with_questions(self, quiz_id: UUID) -> Quiz:
+        stmt = select(Quiz).where(Quiz.id == quiz_id).options(
+            joinedload(Quiz.questions).joinedload(Question.answers))
+        result = await self.db.execute(stmt)
+        quiz = result.unique().scalars().first()
         if not quiz:
             raise HTTPException(status_code=404, detail="Quiz not found")
+        return quiz
 
-    async def if_questions_exists_get_questions_ids_list(self, quiz_id: UUID) -> List[UUID]:
-        questions = await self.db.execute(select(Question).where(Question.quiz_id == quiz_id))
-        questions = questions.scalars().all()
-        if not questions:
-            raise HTTPException(status_code=404, detail="Questions not found")
-        question_ids = [question.id for question in questions]
-        return question_ids
-
-    async def get_questions_answers_list_dicts(self, question_ids: List[UUID]) -> List[dict]:
-        questions_answers_list_dicts = []
-        for question_id in question_ids:
-            question_answers = await self.get_question_answers(question_id)
-            questions_answers_list_dicts.append(question_answers)
-        return questions_answers_list_dicts
-
-    async def save_user_answers(self, user_answers: dict, result_id: UUID):
-        for answer in user_answers:
-            question_id = answer['question_id']
-            answers = []
-            for ans in answer['answers']:
-                user_answer = UserAnswer(
-                    result_id=result_id,
-                    question_id=question_id,
-                    answer_id=ans['answer_id']
-                )
-                answers.append(user_answer)
-            self.db.add_all(answers)
-
-        await self.db.commit()
-        return answers
-
-    async def submit_quiz_result(self, correct_answers: int, questions: int, quiz_id: UUID, current_user_id: UUID):
+    async def submit_quiz_result(self, correct_answers: int, questions: int, quiz_id: UUID, company_id: UUID, frequency_days: int, current_user_id: UUID, user_answers: List[dict]):
         score = correct_answers/questions
-        quiz_result = Result(
+        # Lock the existing result first so a concurrent retake waits for us
+        # and the score it replaces is the one we read here
+        previous_result = await self.db.execute(select(Result.id, Result.score).where(Result.quiz_id == quiz_id).where(Result.user_id == current_user_id).with_for_update())
+        previous_result = previous_result.first()
+        result_insert = pg_insert(Result).values(
             quiz_id=quiz_id,
             user_id=current_user_id,
-            score=score,
-            created_at=datetime.utcnow()
+            score=score
         )
-
-        self.db.add(quiz_result)
+        if previous_result is None:
+            # A concurrent first submission wins the unique constraint, this one returns nothing
+            result_insert = result_insert.on_conflict_do_nothing(
+                constraint='_results_user_quiz_uc')
+        else:
+            # A retake inside the quiz's frequency window fails the WHERE, so nothing is returned
+            result_insert = result_insert.on_conflict_do_update(
+                constraint='_results_user_quiz_uc',
+                set_={"score": result_insert.excluded.score, "created_at": func.now()},
+                where=Result.created_at <= func.now() - func.make_interval(0, 0, 0, frequency_days)
+            )
+        result_insert = result_insert.returning(
+            Result.id, Result.score, Result.created_at, literal_column("(xmax = 0)", Boolean).label('inserted'))
+        quiz_result = await self.db.execute(result_insert)
+        quiz_result = quiz_result.mappings().first()
+        if not quiz_result:
+            raise HTTPException(
+                status_code=400, detail="You already submitted this quiz")
+        quiz_result = {**quiz_result, "previous_score": None if quiz_result['inserted'] else previous_result.score}
+        if quiz_result['previous_score'] is not None:
+            await self.db.execute(delete(UserAnswer).where(UserAnswer.result_id == quiz_result['id']))
+
+        user_answers_rows = [
+            {"result_id": quiz_result['id'], "question_id": answer['question_id'],
+                "answer_id": ans['answer_id']}
+            for answer in user_answers for ans in answer['answers']
+        ]
+        if user_answers_rows:
+            await self.db.execute(insert(UserAnswer), user_answers_rows)
+
+        avarage_marks = await ScoreAggregateRepository(self.db).add_submission(current_user_id, company_id, quiz_id, quiz_result['score'], quiz_result['created_at'], quiz_result['previous_score'])
         await self.db.commit()
-        await self.db.refresh(quiz_result)
-        return quiz_result
+        return {**quiz_result, **avarage_marks}
 
     async def get_quiz_results_for_user(self, quiz_id: UUID, current_user_id: UUID):
         user_result = await self.db.execute(select(Result).where(Result.quiz_id == quiz_id).where(Result.user_id == current_user_id))
@@ -294,39 +292,24 @@ class QuizRepository:
                 status_code=404, detail="You have not submitted any quiz yet")
         return results
 
-    async def get_user_results_of_quizzes_for(self, user_id: UUID):
-        results = await self.db.execute(select(Result).where(Result.user_id == user_id))
-        results = results.scalars().all()
-        if not results:
-            return None
-        return results
-
-    async def get_user_results_of_quizzes_in_company(self, company_id: UUID, user_id: UUID):
-        results = await self.db.execute(select(Result).join(Quiz).where(Quiz.company_id == company_id).where(Result.user_id == user_id))
-        results = results.scalars().all()
-        if not results:
-            raise HTTPException(
-                status_code=404, detail="You have not submitted any quiz in this company yet")
-
-        return results
+    async def stream_user_results_of_quizzes(self, user_id: UUID):
+        results = await self.db.stream_scalars(select(Result).where(Result.user_id == user_id).execution_options(yield_per=settings.db_stream_yield_per))
+        async for result in results:
+            yield result
+
+    async def get_user_running_average_scores(self, user_id: UUID) -> List[dict]:
+        running_average = func.avg(Result.score).over(
+            order_by=(Result.created_at, Result.id), rows=(None, 0))
+        stmt = (
+            select(Result.quiz_id, running_average.label('avarage_mark'),
+                   Result.score, Result.id.label('result_id')).
+            where(Result.user_id == user_id).
+            order_by(Result.created_at, Result.id)
+        )
+        results = await self.db.execute(stmt)
+        return [dict(row) for row in results.mappings().all()]
 
     # be-13
-    async def get_user_id_by_result_id(self, result_id: UUID):
-        result = await self.db.execute(select(Result).where(Result.id == result_id))
-        result = result.scalars().first()
-        if not result:
-            raise HTTPException(status_code=404, detail="Result not found")
-        user_id = result.user_id
-        return user_id
-
-    async def get_quiz_id_by_result_id(self, result_id: UUID):
-        result = await self.db.execute(select(Result).where(Result.id == result_id))
-        result = result.scalars().first()
-        if not result:
-            raise HTTPException(status_code=404, detail="Result not found")
-        quiz_id = result.quiz_id
-        return quiz_id
-
     async def get_company_id_by_quiz_id(self, quiz_id: UUID):
         quiz = await self.db.execute(select(Quiz).where(Quiz.id == quiz_id))
         quiz = quiz.scalars().first()
@@ -335,14 +318,6 @@ class QuizRepository:
         company_id = quiz.company_id
         return company_id
 
-    async def check_if_user_answer_is_correct(self, user_answer_id: UUID, user_answer_question_id: UUID):
-        correct_answer_id = await self.db.execute(select(Answer.id).where(Answer.question_id == user_answer_question_id).where(Answer.is_correct == True))
-        correct_answer_id = correct_answer_id.scalars().first()
-        if not correct_answer_id:
-            raise HTTPException(
-                status_code=404, detail="Correct answer not found for this question")
-        return user_answer_id == correct_answer_id
-
     async def get_user_answers_by_result_id(self, result_id: UUID) -> List[UserAnswer]:
         user_answers = await self.db.execute(select(UserAnswer).where(UserAnswer.result_id == result_id))
         user_answers = user_answers.scalars().all()
@@ -375,9 +350,46 @@ class QuizRepository:
             raise HTTPException(status_code=404, detail="Members not found")
         return members
 
-    async def get_last_quiz_submition(self, user_id: UUID):
-        result = await self.db.execute(select(Result).where(Result.user_id == user_id).order_by(Result.created_at.desc()).limit(1))
-        result = result.scalars().first()
-        if not result:
-            return None
-        return result
+    async def stream_user_answer_records(self, user_id: UUID, quiz_id: UUID):
+        stmt = (
+            select(UserAnswer.question_id, UserAnswer.answer_id, Result.user_id,
+                   Result.quiz_id, Quiz.company_id, Answer.is_correct).
+            join(Result, Result.id == UserAnswer.result_id).
+            join(Quiz, Quiz.id == Result.quiz_id).
+            join(Answer, Answer.id == UserAnswer.answer_id).
+            where(Result.user_id == user_id).
+            where(Result.quiz_id == quiz_id).
+            execution_options(yield_per=500)
+        )
+        results = await self.db.stream(stmt)
+        async for row in results.mappings():
+            yield dict(row)
+
+    async def stream_company_results_batches(self, company_id: UUID, batch_size: int):
+        stmt = (
+            select(Result.id.label('result_id'), Result.user_id, Result.quiz_id, Result.score,
+                   Result.created_at, UserAnswer.question_id, UserAnswer.answer_id, Answer.is_correct).
+            join(Quiz, Quiz.id == Result.quiz_id).
+            join(UserAnswer, UserAnswer.result_id == Result.id).
+            join(Answer, Answer.id == UserAnswer.answer_id).
+            where(Quiz.company_id == company_id).
+            order_by(Result.quiz_id, Result.user_id).
+            execution_options(yield_per=batch_size)
+        )
+        results = await self.db.stream(stmt)
+        async for rows in results.mappings().partitions():
+            yield [dict(row) for row in rows]
+
+    async def stream_company_members_running_average_scores(self, company_id: UUID):
+        running_average = func.avg(Result.score).over(
+            partition_by=Result.user_id, order_by=(Result.created_at, Result.id), rows=(None, 0))
+        stmt = (
+            select(Result.user_id, Result.quiz_id, running_average.label('avarage_mark'),
+                   Result.score, Result.id.label('result_id')).
+            join(CompanyMember, CompanyMember.user_id == Result.user_id).
+            where(CompanyMember.company_id == company_id).
+            order_by(Result.user_id, Result.created_at, Result.id)
+        )
+        results = await self.db.stream(stmt)
+        async for row in results.mappings():
+            yield dict(row)
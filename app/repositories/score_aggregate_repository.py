@@ -0,0 +1,112 @@
+from app.db.user_models import ScoreAggregate, CompanyMember
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from fastapi import HTTPException
+from sqlalchemy import select, delete, text
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+
+REFRESH_SCORE_AGGREGATES_SQL = text("""
+    INSERT INTO score_aggregates (id, user_id, company_id, quiz_count, score_sum, last_quiz_id, last_submission_at)
+    SELECT gen_random_uuid(), r.user_id, NULL, count(*), sum(r.score),
+           (array_agg(r.quiz_id ORDER BY r.created_at DESC))[1], max(r.created_at)
+    FROM results r
+    WHERE r.user_id = ANY(:user_ids)
+    GROUP BY r.user_id
+    UNION ALL
+    SELECT gen_random_uuid(), r.user_id, q.company_id, count(*), sum(r.score),
+           (array_agg(r.quiz_id ORDER BY r.created_at DESC))[1], max(r.created_at)
+    FROM results r
+    JOIN quizzes q ON q.id = r.quiz_id
+    WHERE r.user_id = ANY(:user_ids)
+    GROUP BY r.user_id, q.company_id
+""")
+
+
+class ScoreAggregateRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def add_submission(self, user_id: UUID, company_id: UUID, quiz_id: UUID, score: float, created_at: datetime, previous_score: Optional[float] = None):
+        # A retake replaces the previous result, so it only moves the sum
+        if previous_score is None:
+            quiz_count, score_sum = 1, score
+        else:
+            quiz_count, score_sum = 0, score - previous_score
+        avarage_marks = {}
+        for aggregate_company_id in (None, company_id):
+            stmt = insert(ScoreAggregate).values(
+                user_id=user_id,
+                company_id=aggregate_company_id,
+                quiz_count=quiz_count,
+                score_sum=score_sum,
+                last_quiz_id=quiz_id,
+                last_submission_at=created_at
+            )
+            if aggregate_company_id is None:
+                conflict_target = {"index_elements": [ScoreAggregate.user_id],
+                                   "index_where": ScoreAggregate.company_id.is_(None)}
+            else:
+                conflict_target = {"index_elements": [ScoreAggregate.user_id, ScoreAggregate.company_id],
+                                   "index_where": ScoreAggregate.company_id.isnot(None)}
+            stmt = stmt.on_conflict_do_update(
+                **conflict_target,
+                set_={
+                    "quiz_count": ScoreAggregate.quiz_count + stmt.excluded.quiz_count,
+                    "score_sum": ScoreAggregate.score_sum + stmt.excluded.score_sum,
+                    "last_quiz_id": stmt.excluded.last_quiz_id,
+                    "last_submission_at": stmt.excluded.last_submission_at
+                }
+            ).returning(ScoreAggregate.quiz_count, ScoreAggregate.score_sum)
+            aggregate = await self.db.execute(stmt)
+            aggregate = aggregate.one()
+            avarage_marks[aggregate_company_id] = aggregate.score_sum / aggregate.quiz_count if aggregate.quiz_count else 0
+        return {"avarage_mark": avarage_marks[None], "company_avarage_mark": avarage_marks[company_id]}
+
+    async def refresh_user_aggregates(self, user_ids: List[UUID]):
+        if not user_ids:
+            return
+        await self.db.execute(delete(ScoreAggregate).where(ScoreAggregate.user_id.in_(user_ids)))
+        await self.db.execute(REFRESH_SCORE_AGGREGATES_SQL, {"user_ids": list(user_ids)})
+
+    async def get_user_avarage_marks(self, user_ids: List[UUID]) -> List[dict]:
+        if not user_ids:
+            return []
+        stmt = (
+            select(ScoreAggregate.user_id, ScoreAggregate.company_id,
+                   (ScoreAggregate.score_sum / ScoreAggregate.quiz_count).label('avarage_mark')).
+            where(ScoreAggregate.user_id.in_(user_ids)).
+            where(ScoreAggregate.quiz_count > 0)
+        )
+        aggregates = await self.db.execute(stmt)
+        return [dict(row) for row in aggregates.mappings().all()]
+
+    async def get_user_aggregate(self, user_id: UUID, company_id: UUID = None) -> ScoreAggregate:
+        stmt = select(ScoreAggregate).where(ScoreAggregate.user_id == user_id)
+        if company_id is None:
+            stmt = stmt.where(ScoreAggregate.company_id.is_(None))
+        else:
+            stmt = stmt.where(ScoreAggregate.company_id == company_id)
+        aggregate = await self.db.execute(stmt)
+        aggregate = aggregate.scalars().first()
+        if not aggregate or not aggregate.quiz_count:
+            if company_id is None:
+                raise HTTPException(
+                    status_code=404, detail="You have not submitted any quiz yet")
+            raise HTTPException(
+                status_code=404, detail="You have not submitted any quiz in this company yet")
+        return aggregate
+
+    async def stream_company_members_last_quiz_submition(self, company_id: UUID):
+        stmt = (
+            select(ScoreAggregate.user_id, ScoreAggregate.last_quiz_id.label('quiz_id'),
+                   ScoreAggregate.last_submission_at.label('last_quiz_submition')).
+            join(CompanyMember, CompanyMember.user_id == ScoreAggregate.user_id).
+            where(CompanyMember.company_id == company_id).
+            where(ScoreAggregate.company_id.is_(None))
+        )
+        results = await self.db.stream(stmt)
+        async for row in results.mappings():
+            yield dict(row)
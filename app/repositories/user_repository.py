@@ -1,12 +1,18 @@
-from app.db.user_models import User, Action, ActionStatus
+from app.db.user_models import User, Action, ActionStatus, Quiz, Result
+from app.db.leaderboard import leaderboards
 from app.schemas.user_schemas import SignUpRequestSchema, UserUpdateRequestSchema, UserListSchema, UserDetailSchema, UserInvitationSchema
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from fastapi import HTTPException
 from sqlalchemy import select
+from app.utils.pagination import paginate_query
 import logging
 from sqlalchemy.exc import DBAPIError
 from uuid import UUID
+from app.core.config import Settings
+
+
+settings = Settings()
 
 
 class UserRepository:
@@ -36,8 +42,13 @@ class UserRepository:
         logging.info("Users found")
         return users
 
-    async def get_users_list_paginated(self, page: int, limit: int) -> List[User]:
-        users = await self.db.execute(select(User).offset((page - 1) * limit).limit(limit))
+    async def stream_users(self):
+        users = await self.db.stream_scalars(select(User).execution_options(yield_per=settings.db_stream_yield_per))
+        async for user in users:
+            yield user
+
+    async def get_users_list_paginated(self, page: int, limit: int, cursor: Optional[str] = None) -> List[User]:
+        users = await self.db.execute(paginate_query(select(User), User.id, page, limit, cursor))
         users = users.scalars().all()
         if not users and users != []:
             raise HTTPException(
@@ -50,8 +61,11 @@ class UserRepository:
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         print("Deleting user:", user.username)
+        submitted_quizzes = await self.db.execute(select(Result.quiz_id, Quiz.company_id).join(Quiz, Quiz.id == Result.quiz_id).where(Result.user_id == user_id))
+        submitted_quizzes = submitted_quizzes.all()
         await self.db.delete(user)
         await self.db.commit()
+        await leaderboards.remove_user(user_id, {company_id for _, company_id in submitted_quizzes}, [quiz_id for quiz_id, _ in submitted_quizzes])
         logging.info(f"User with id {user_id} deleted")
 
     async def update_user(self, user: UserUpdateRequestSchema, user_data: dict) -> User:
@@ -1,14 +1,17 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.connect_postgresql import get_session
-from fastapi import APIRouter, HTTPException, status
+from app.db.connect_postgresql import get_session, get_read_session
+from fastapi import APIRouter, HTTPException, status, Query
 
-from app.db.user_models import User, Company
+from app.db.user_models import User, Company, ExportType
+from app.utils.exports import EXPORT_MEDIA_TYPES, encode_records
+from fastapi.responses import StreamingResponse
 from app.schemas.company_schemas import CompanyCreateSchema, CompanyActionSchema
 from app.services.company_services import CompanyService
 from app.services.quiz_service import QuizService
 from app.services.user_service import get_current_user_from_token
 from uuid import UUID
+from typing import Optional
 
 company_router = APIRouter(tags=["Company"])
 
@@ -20,15 +23,15 @@ async def create_company(company_data: CompanyCreateSchema, db: AsyncSession = D
 
 
 @company_router.get("/companies/{company_id}")
-async def get_company_by_id(company_id: UUID, db: AsyncSession = Depends(get_session)):
+async def get_company_by_id(company_id: UUID, db: AsyncSession = Depends(get_read_session)):
     service = CompanyService(db)
     return await service.get_company_by_id(company_id)
 
 
 @company_router.get("/companies/")
-async def get_companies_list_paginated(page: int = 1, limit: int = 5, db: AsyncSession = Depends(get_session)):
+async def get_companies_list_paginated(page: int = Query(1, ge=1), limit: int = Query(5, ge=1, le=100), cursor: Optional[str] = None, db: AsyncSession = Depends(get_read_session)):
     service = CompanyService(db)
-    companies = await service.get_companies_list_paginated(page, limit)
+    companies = await service.get_companies_list_paginated(page, limit, cursor)
     return companies
 
 
@@ -109,6 +112,13 @@ async def get_company_members(company_id: UUID, db: AsyncSession = Depends(get_s
     return await service.get_company_members(company_id, current_user)
 
 
+@company_router.get("/companies/{company_id}/members/stream")
+async def stream_company_members(company_id: UUID, db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = CompanyService(db)
+    members = await service.get_company_members_stream(company_id, current_user)
+    return StreamingResponse(encode_records(members, ExportType.NDJSON), media_type=EXPORT_MEDIA_TYPES[ExportType.NDJSON])
+
+
 @company_router.post("/send-join-request/{company_id}", response_model=CompanyActionSchema)
 async def send_join_request(company_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
     service = CompanyService(db)
@@ -164,18 +174,18 @@ async def get_company_admins(company_id: UUID, db: AsyncSession = Depends(get_se
 
 
 @company_router.get("/companies/get-avarage-marks-all-members/{company_id}")
-async def get_avarage_marks_all_members(company_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_avarage_marks_all_members(company_id: UUID, db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     return await service.get_avarage_marks_all_members(current_user, company_id)
 
 
 @company_router.get("/companies/{company_id}/get-avarage-marks-of-user/{user_id}")
-async def get_avarage_marks_of_user(company_id: UUID, user_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_avarage_marks_of_user(company_id: UUID, user_id: UUID, db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     return await service.get_avarage_marks_of_member(current_user, company_id, user_id)
 
 
 @company_router.get("/companies/{company_id}/get-members-and-last-quiz-submition")
-async def get_members_and_last_quiz_submition(company_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_members_and_last_quiz_submition(company_id: UUID, db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     return await service.get_members_and_last_quiz_submition(current_user, company_id)
@@ -1,13 +1,28 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Header
+from typing import Optional
 import logging
+import secrets
+from app.core.config import Settings
 from app.db.connect_redis import check_redis_connection
 from app.db.connect_postgresql import check_connection
+from app.utils.utils import get_password_hashing_stats
+from app.core.background_jobs import background_jobs
 
 
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s - %(levelname)s - %(message)s', filename='app.log')
 health_check_router = APIRouter()
 
+settings = Settings()
+
+
+async def verify_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    # Metrics stay disabled unless a token is configured for the scraper
+    if not settings.metrics_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_metrics_token or not secrets.compare_digest(x_metrics_token, settings.metrics_token):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
 
 @health_check_router.get("/")
 async def health_check():
@@ -22,3 +37,11 @@ async def health_check():
         "redis_status": f"{redis}",
         "postgres_status": f"{postgres}"
     }
+
+
+@health_check_router.get("/metrics", dependencies=[Depends(verify_metrics_token)])
+async def metrics():
+    return {
+        "password_hashing": get_password_hashing_stats(),
+        "background_jobs": await background_jobs.get_stats()
+    }
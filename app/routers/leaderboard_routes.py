@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+from app.db.connect_postgresql import get_read_session
+from app.db.user_models import User
+from app.services.leaderboard_service import LeaderboardService
+from app.services.user_service import get_current_user_from_token
+
+
+leaderboard_router = APIRouter(tags=["Leaderboards"])
+
+
+@leaderboard_router.get("/leaderboards/global")
+async def get_global_leaderboard(limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = LeaderboardService(db)
+    return await service.get_global_leaderboard(limit)
+
+
+@leaderboard_router.get("/leaderboards/global/me")
+async def get_my_global_rank(neighbours: int = Query(2, ge=0, le=50), db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = LeaderboardService(db)
+    return await service.get_my_global_rank(neighbours, current_user)
+
+
+@leaderboard_router.get("/leaderboards/companies/{company_id}")
+async def get_company_leaderboard(company_id: UUID, limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = LeaderboardService(db)
+    return await service.get_company_leaderboard(company_id, limit, current_user)
+
+
+@leaderboard_router.get("/leaderboards/companies/{company_id}/me")
+async def get_my_company_rank(company_id: UUID, neighbours: int = Query(2, ge=0, le=50), db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = LeaderboardService(db)
+    return await service.get_my_company_rank(company_id, neighbours, current_user)
+
+
+@leaderboard_router.get("/leaderboards/quizzes/{quiz_id}")
+async def get_quiz_leaderboard(quiz_id: UUID, limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = LeaderboardService(db)
+    return await service.get_quiz_leaderboard(quiz_id, limit, current_user)
+
+
+@leaderboard_router.get("/leaderboards/quizzes/{quiz_id}/me")
+async def get_my_quiz_rank(quiz_id: UUID, neighbours: int = Query(2, ge=0, le=50), db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = LeaderboardService(db)
+    return await service.get_my_quiz_rank(quiz_id, neighbours, current_user)
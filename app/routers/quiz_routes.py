@@ -1,20 +1,32 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.connect_postgresql import get_session
-from app.db.connect_redis import RedisClient
-from fastapi import APIRouter, HTTPException, status
+from app.db.connect_postgresql import get_session, get_read_session
+from app.db.connect_redis import RedisClient, get_redis_client
+from fastapi import APIRouter, HTTPException, status, Request, Response, Query
 
-from app.db.user_models import User, Company
+from app.db.user_models import User, Company, ExportType
+from app.utils.exports import EXPORT_MEDIA_TYPES
+from fastapi.responses import StreamingResponse
 from app.schemas.user_answer_schemas import AnswerQuestionListSchema
 from app.schemas.quiz_shemas import QuizCreateSchema, QuizUpdateSchema, QuizResponseSchema, QuizSchema, AnswerListSchema, QuestionListSchema, QuizListSchema
 from app.services.quiz_service import QuizService
 from app.services.user_service import get_current_user_from_token
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 quiz_router = APIRouter(tags=["Quizzes"])
 
 
+def cached_json_response(request: Request, content: bytes, etag: str) -> Response:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        request_etags = [tag.strip().removeprefix("W/")
+                         for tag in if_none_match.split(",")]
+        if etag in request_etags or "*" in request_etags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=content, media_type="application/json", headers={"ETag": etag})
+
+
 @quiz_router.post("/quizzes/{company_id}/create", response_model=QuizResponseSchema)
 async def create_quiz(company_id: UUID, quiz_data: QuizCreateSchema, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
@@ -30,17 +42,17 @@ async def get_quiz_by_id(quiz_id: UUID, db: AsyncSession = Depends(get_session),
 
 
 @quiz_router.get("/quizzes/{quiz_id}/full", response_model=QuizResponseSchema)
-async def get_quiz_by_id_full_info(quiz_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_quiz_by_id_full_info(quiz_id: UUID, request: Request, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
-    result = await service.get_quiz_by_id_full_info(quiz_id, current_user)
-    return result
+    content, etag = await service.get_quiz_by_id_full_info(quiz_id, current_user)
+    return cached_json_response(request, content, etag)
 
 
 @quiz_router.get("/quizzes/{quiz_id}/questions", response_model=QuestionListSchema)
-async def get_quiz_questions(quiz_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_quiz_questions(quiz_id: UUID, request: Request, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
-    result = await service.get_quiz_questions_to_response(quiz_id, current_user)
-    return result
+    content, etag = await service.get_quiz_questions_to_response(quiz_id, current_user)
+    return cached_json_response(request, content, etag)
 
 
 @quiz_router.get("/questions/{question_id}/answers", response_model=AnswerListSchema)
@@ -65,17 +77,17 @@ async def update_quiz(quiz_data: QuizUpdateSchema, quiz_id: UUID, db: AsyncSessi
 
 
 @quiz_router.get("/quizzes/{company_id}/list-quizzes", response_model=QuizListSchema)
-async def list_quizzes(company_id: UUID, page: int = 1, limit: int = 5, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def list_quizzes(company_id: UUID, page: int = Query(1, ge=1), limit: int = Query(5, ge=1, le=100), cursor: Optional[str] = None, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
-    result = await service.list_quizzes(company_id, current_user, page, limit)
+    result = await service.list_quizzes(company_id, current_user, page, limit, cursor)
     return result
 
 # be-12
 
 
 @quiz_router.post("/company/{company_id}/quizzes/{quiz_id}/start")
-async def start_quiz(user_answers: AnswerQuestionListSchema, company_id: UUID, quiz_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
-    service = QuizService(db)
+async def start_quiz(user_answers: AnswerQuestionListSchema, company_id: UUID, quiz_id: UUID, db: AsyncSession = Depends(get_session), redis_client: RedisClient = Depends(get_redis_client), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db, redis_client)
     result = await service.submit_quiz_answers(user_answers, company_id, quiz_id, current_user)
     return result
 
@@ -90,7 +102,7 @@ async def get_quiz_results(company_id: UUID, quiz_id: UUID, db: AsyncSession = D
 
 
 @quiz_router.get("/company/{user_id}/avarage-mark-from-quizzes")
-async def get_user_avarage_mark_from_quizzes(user_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_user_avarage_mark_from_quizzes(user_id: UUID, db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     result = await service.get_user_avarage_mark_from_quizzes(user_id, current_user)
     return result
@@ -99,30 +111,38 @@ async def get_user_avarage_mark_from_quizzes(user_id: UUID, db: AsyncSession = D
 
 
 @quiz_router.get("/company/{company_id}/user/{user_id}/avarage-mark-from-quizzes")
-async def get_user_avarage_mark_from_quizzes_in_company(company_id: UUID, user_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_user_avarage_mark_from_quizzes_in_company(company_id: UUID, user_id: UUID, db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     result = await service.get_user_avarage_mark_from_quizzes_in_company(user_id, company_id, current_user)
     return result
 
 
-@quiz_router.get("/get-saved-results-redis/{key}")
-async def get_saved_results_redis(key: str, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
-    service = QuizService(db)
-    result = await service.get_data_from_redis(key)
+@quiz_router.get("/get-saved-results-redis/{quiz_id}")
+async def get_saved_results_redis(quiz_id: UUID, db: AsyncSession = Depends(get_session), redis_client: RedisClient = Depends(get_redis_client), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db, redis_client)
+    current_user_id = current_user.id
+    result = await service.get_data_from_redis(current_user_id, quiz_id)
     return result
 
 # be-14
 
 
 @quiz_router.get("/get-results-of-user-in-company/{company_id}/{user_id}")
-async def get_results_of_user_in_company(company_id: UUID, user_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
-    service = QuizService(db)
+async def get_results_of_user_in_company(company_id: UUID, user_id: UUID, db: AsyncSession = Depends(get_session), redis_client: RedisClient = Depends(get_redis_client), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db, redis_client)
     result = await service.get_results_of_user_in_company(user_id, company_id, current_user)
     return result
 
 
 @quiz_router.get("/get-results-of-all_users-in-company/{company_id}")
-async def get_results_of_all_users_in_company(company_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
-    service = QuizService(db)
+async def get_results_of_all_users_in_company(company_id: UUID, db: AsyncSession = Depends(get_session), redis_client: RedisClient = Depends(get_redis_client), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db, redis_client)
     result = await service.get_results_of_all_users_in_company(company_id, current_user)
     return result
+
+
+@quiz_router.get("/get-results-of-all_users-in-company/{company_id}/export")
+async def export_results_of_all_users_in_company(company_id: UUID, type: ExportType = ExportType.PARQUET, db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db)
+    content = await service.export_company_results(company_id, type, current_user)
+    return StreamingResponse(content, media_type=EXPORT_MEDIA_TYPES[type], headers={"Content-Disposition": f'attachment; filename="company_results_{company_id}.{type.value}"'})
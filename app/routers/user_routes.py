@@ -1,17 +1,20 @@
 from app.services.user_service import get_current_user_from_token
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from app.db.connect_postgresql import get_session
+from app.db.connect_postgresql import get_session, get_read_session
+from app.db.connect_redis import RedisClient, get_redis_client
 from app.schemas.auth_schemas import Token
 from app.schemas.user_schemas import SignUpRequestSchema, UserUpdateRequestSchema, UserListSchema, UserDetailSchema, UserInvitationListSchema
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Query
 from app.services.user_service import UserService
 from app.services.quiz_service import QuizService
 from app.auth.jwtauth import JWTAuth
 from uuid import UUID
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import Annotated
-from app.db.user_models import User
+from typing import Annotated, Optional
+from app.db.user_models import User, ExportType, ExportSource
+from app.utils.exports import EXPORT_MEDIA_TYPES, encode_records
+from fastapi.responses import StreamingResponse
 from app.auth.jwtauth import oauth2_scheme
 from fastapi.security import HTTPAuthorizationCredentials
 from app.services.user_service import get_current_user_from_token
@@ -26,6 +29,12 @@ async def create_user(user_data: SignUpRequestSchema, db: AsyncSession = Depends
     return await service.create_user(user_data)
 
 
+@user_router.get("/users/stream")
+async def stream_users(db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = UserService(db)
+    return StreamingResponse(encode_records(service.stream_users(), ExportType.NDJSON), media_type=EXPORT_MEDIA_TYPES[ExportType.NDJSON])
+
+
 @user_router.get("/users/{user_id}", response_model=UserDetailSchema)
 async def get_user_by_id(user_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
     service = UserService(db)
@@ -33,9 +42,9 @@ async def get_user_by_id(user_id: UUID, db: AsyncSession = Depends(get_session),
 
 
 @user_router.get("/users/", response_model=UserListSchema)
-async def get_users_list_paginated(page: int = 1, limit: int = 5, db: AsyncSession = Depends(get_session)):
+async def get_users_list_paginated(page: int = Query(1, ge=1), limit: int = Query(5, ge=1, le=100), cursor: Optional[str] = None, db: AsyncSession = Depends(get_read_session)):
     service = UserService(db)
-    users = await service.get_users_list_paginated(page, limit)
+    users = await service.get_users_list_paginated(page, limit, cursor)
     return users
 
 
@@ -84,25 +93,32 @@ async def get_my_requests(db: AsyncSession = Depends(get_session), current_user:
 # be-14
 # it is number of user_answer in redis (special id if user need to get only answers with this id)
 @user_router.post("/get-my-quiz-results/{quiz_id}/{redis_id}")
-async def get_my_quiz_results(quiz_id: UUID, redis_id: int, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
-    service = QuizService(db)
+async def get_my_quiz_results(quiz_id: UUID, redis_id: int, db: AsyncSession = Depends(get_session), redis_client: RedisClient = Depends(get_redis_client), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db, redis_client)
     current_user_id = current_user.id
-    key = f"user_answer:{current_user_id}:{quiz_id}:{redis_id}"
-    results = await service.get_data_from_redis(key)
+    results = await service.get_user_answer_record(current_user_id, quiz_id, redis_id)
     return results
 
 
 @user_router.post("/get-my-quiz-results/{quiz_id}")
-async def get_my_quiz_results(quiz_id: UUID, db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
-    service = QuizService(db)
+async def get_my_quiz_results(quiz_id: UUID, db: AsyncSession = Depends(get_session), redis_client: RedisClient = Depends(get_redis_client), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db, redis_client)
     current_user_id = current_user.id
     results = await service.get_all_user_answer_records(current_user_id, quiz_id)
     return results
+
+
+@user_router.get("/get-my-quiz-results/{quiz_id}/export")
+async def export_my_quiz_results(quiz_id: UUID, type: ExportType = ExportType.CSV, source: ExportSource = ExportSource.POSTGRES, db: AsyncSession = Depends(get_read_session), redis_client: RedisClient = Depends(get_redis_client), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db, redis_client)
+    current_user_id = current_user.id
+    content = service.export_user_answer_records(current_user_id, quiz_id, type, source)
+    return StreamingResponse(content, media_type=EXPORT_MEDIA_TYPES[type], headers={"Content-Disposition": f'attachment; filename="quiz_results_{quiz_id}.{type.value}"'})
 # be-15
 
 
 @user_router.post("/get-my-rating")
-async def get_my_rating(db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_my_rating(db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     current_user_id = current_user.id
     rating = await service.get_user_rating(current_user_id)
@@ -110,7 +126,7 @@ async def get_my_rating(db: AsyncSession = Depends(get_session), current_user: U
 
 
 @user_router.post("/get-my-list-of-avarage-marks")
-async def get_my_list_of_avarage_marks(db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_my_list_of_avarage_marks(db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     current_user_id = current_user.id
     rating = await service.get_average_scores(current_user_id)
@@ -118,8 +134,16 @@ async def get_my_list_of_avarage_marks(db: AsyncSession = Depends(get_session),
 
 
 @user_router.post("/get-my-submited-quizzes")
-async def get_my_submited_quizzes(db: AsyncSession = Depends(get_session), current_user: User = Depends(get_current_user_from_token)):
+async def get_my_submited_quizzes(db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
     service = QuizService(db)
     current_user_id = current_user.id
     list_quizzes = await service.get_list_of_quizzes_which_i_submit(current_user_id)
     return list_quizzes
+
+
+@user_router.get("/get-my-submited-quizzes/stream")
+async def stream_my_submited_quizzes(db: AsyncSession = Depends(get_read_session), current_user: User = Depends(get_current_user_from_token)):
+    service = QuizService(db)
+    current_user_id = current_user.id
+    results = service.stream_user_results(current_user_id)
+    return StreamingResponse(encode_records(results, ExportType.NDJSON), media_type=EXPORT_MEDIA_TYPES[ExportType.NDJSON])
@@ -37,6 +37,7 @@ class CompanyDetailSchema(CompanySchema):
 
 class CompanyListSchema(BaseModel):
     companies: List[CompanyDetailSchema]
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
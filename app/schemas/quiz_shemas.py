@@ -108,6 +108,7 @@ class QuizUpdateSchema(BaseModel):
 
 class QuizListSchema(BaseModel):
     quizzes: List[QuizSchema]
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes=True
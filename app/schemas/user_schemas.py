@@ -61,6 +61,7 @@ class UserDetailSchema(UserSchema):
 
 class UserListSchema(BaseModel):
     users: List[UserDetailSchema]
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,28 @@
+"""Repopulate the Redis leaderboards from the results table.
+
+Run after a Redis flush or whenever the boards drifted:
+
+    python -m app.scripts.rebuild_leaderboards
+"""
+import asyncio
+import logging
+from app.db.connect_postgresql import async_read_session, engine, replica_engine
+from app.db.connect_redis import close_redis_pool
+from app.services.leaderboard_service import LeaderboardService
+
+
+async def main():
+    try:
+        async with async_read_session() as session:
+            rebuilt = await LeaderboardService(session).rebuild_leaderboards()
+        logging.info(f"Leaderboards rebuilt: {rebuilt}")
+        print(f"Rebuilt {rebuilt['quizzes']} quiz, {rebuilt['companies']} company and {rebuilt['global']} global leaderboards")
+    finally:
+        await close_redis_pool()
+        await engine.dispose()
+        if replica_engine is not engine:
+            await replica_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,8 +11,9 @@ from uuid import UUID
 from app.auth.jwtauth import oauth2_scheme
 from jose import jwt
 from fastapi import Depends
-from app.db.connect_postgresql import get_session
+from app.db.connect_postgresql import get_session, async_read_session
 from app.db.user_models import User
+from app.utils.pagination import split_page
 
 
 class CompanyService:
@@ -28,9 +29,10 @@ class CompanyService:
         company = await self.company_repository.get_company_by_id(company_id)
         return company
 
-    async def get_companies_list_paginated(self, page: int, limit: int) -> List[CompanyDetailSchema]:
-        companies = await self.company_repository.get_company_list_paginated(page, limit)
-        return CompanyListSchema(companies=[CompanyDetailSchema.from_orm(company) for company in companies])
+    async def get_companies_list_paginated(self, page: int, limit: int, cursor: Optional[str] = None) -> CompanyListSchema:
+        companies = await self.company_repository.get_company_list_paginated(page, limit, cursor)
+        companies, next_cursor = split_page(companies, limit)
+        return CompanyListSchema(companies=[CompanyDetailSchema.from_orm(company) for company in companies], next_cursor=next_cursor)
 
     async def delete_company(self, company_id: UUID, current_user: User):
         await self.check_if_owner_of_company(company_id, current_user)
@@ -114,6 +116,15 @@ class CompanyService:
         users = await self.company_repository.get_company_members(company_id)
         return UserListSchema(users=[UserDetailSchema.from_orm(user) for user in users])
 
+    async def get_company_members_stream(self, company_id: UUID, current_user: User):
+        await self.check_if_owner_of_company(company_id, current_user)
+        return self.stream_company_members(company_id)
+
+    async def stream_company_members(self, company_id: UUID):
+        async with async_read_session() as session:
+            async for user in CompanyRepository(session).stream_company_members(company_id):
+                yield UserDetailSchema.from_orm(user).model_dump()
+
     async def send_join_request(self, company_id: UUID, current_user: User) -> None:
         await self.check_if_owner_not_request(company_id, current_user.id)
         await self.check_if_user_is_member_of_company(company_id, current_user.id)
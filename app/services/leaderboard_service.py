@@ -0,0 +1,94 @@
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.user_models import User
+from app.db.leaderboard import leaderboards, LEADERBOARD_QUIZ_KEY, LEADERBOARD_COMPANY_KEY, LEADERBOARD_GLOBAL_KEY
+from app.repositories.quiz_repository import QuizRepository
+from app.repositories.leaderboard_repository import LeaderboardRepository
+
+
+class LeaderboardService:
+    def __init__(self, db: AsyncSession):
+        self.quiz_repository = QuizRepository(db)
+        self.leaderboard_repository = LeaderboardRepository(db)
+
+    async def get_quiz_leaderboard_key(self, quiz_id: UUID, current_user: User) -> str:
+        company_id = await self.quiz_repository.membership_loader.get_quiz_company_id(quiz_id)
+        if not company_id:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        await self.quiz_repository.check_if_user_member_of_company(current_user.id, company_id)
+        return LEADERBOARD_QUIZ_KEY.format(quiz_id=quiz_id)
+
+    async def get_company_leaderboard_key(self, company_id: UUID, current_user: User) -> str:
+        await self.quiz_repository.check_if_user_member_of_company(current_user.id, company_id)
+        return LEADERBOARD_COMPANY_KEY.format(company_id=company_id)
+
+    async def get_top(self, key: str, limit: int):
+        leaderboard = await leaderboards.top(key, limit)
+        return {"leaderboard": leaderboard}
+
+    async def get_user_rank(self, key: str, user_id: UUID, neighbours: int):
+        rank = await leaderboards.get_rank(key, user_id, neighbours)
+        if not rank:
+            raise HTTPException(
+                status_code=404, detail="You are not ranked on this leaderboard yet")
+        return rank
+
+    async def get_global_leaderboard(self, limit: int):
+        return await self.get_top(LEADERBOARD_GLOBAL_KEY, limit)
+
+    async def get_company_leaderboard(self, company_id: UUID, limit: int, current_user: User):
+        key = await self.get_company_leaderboard_key(company_id, current_user)
+        return await self.get_top(key, limit)
+
+    async def get_quiz_leaderboard(self, quiz_id: UUID, limit: int, current_user: User):
+        key = await self.get_quiz_leaderboard_key(quiz_id, current_user)
+        return await self.get_top(key, limit)
+
+    async def get_my_global_rank(self, neighbours: int, current_user: User):
+        return await self.get_user_rank(LEADERBOARD_GLOBAL_KEY, current_user.id, neighbours)
+
+    async def get_my_company_rank(self, company_id: UUID, neighbours: int, current_user: User):
+        key = await self.get_company_leaderboard_key(company_id, current_user)
+        return await self.get_user_rank(key, current_user.id, neighbours)
+
+    async def get_my_quiz_rank(self, quiz_id: UUID, neighbours: int, current_user: User):
+        key = await self.get_quiz_leaderboard_key(quiz_id, current_user)
+        return await self.get_user_rank(key, current_user.id, neighbours)
+
+    async def rebuild_grouped(self, partitions, key_format: str) -> set:
+        # Rows arrive ordered by board, so each board is finished before the next starts
+        rebuilt_keys = set()
+        current_key = None
+        async for rows in partitions:
+            boards = {}
+            for board_id, user_id, score in rows:
+                boards.setdefault(key_format.format(board_id=board_id), {})[str(user_id)] = score
+            for key, entries in boards.items():
+                if key != current_key:
+                    if current_key:
+                        await leaderboards.finish_rebuild(current_key)
+                    await leaderboards.begin_rebuild(key)
+                    current_key = key
+                    rebuilt_keys.add(key)
+                await leaderboards.add_rebuild_entries(key, entries)
+        if current_key:
+            await leaderboards.finish_rebuild(current_key)
+        return rebuilt_keys
+
+    async def rebuild_leaderboards(self) -> dict:
+        quiz_keys = await self.rebuild_grouped(
+            self.leaderboard_repository.stream_quiz_scores(), LEADERBOARD_QUIZ_KEY.replace("{quiz_id}", "{board_id}"))
+        company_keys = await self.rebuild_grouped(
+            self.leaderboard_repository.stream_company_avarage_marks(), LEADERBOARD_COMPANY_KEY.replace("{company_id}", "{board_id}"))
+        global_keys = await self.rebuild_grouped(
+            self.leaderboard_repository.stream_global_avarage_marks(), LEADERBOARD_GLOBAL_KEY)
+
+        for pattern, rebuilt_keys in ((LEADERBOARD_QUIZ_KEY.format(quiz_id="*"), quiz_keys),
+                                      (LEADERBOARD_COMPANY_KEY.format(company_id="*"), company_keys)):
+            for key in await leaderboards.keys(pattern):
+                if key not in rebuilt_keys:
+                    await leaderboards.delete(key)
+        if not global_keys:
+            await leaderboards.delete(LEADERBOARD_GLOBAL_KEY)
+        return {"quizzes": len(quiz_keys), "companies": len(company_keys), "global": len(global_keys)}
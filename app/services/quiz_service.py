@@ -1,55 +1,132 @@
 from typing import List, Optional
 from app.repositories.quiz_repository import QuizRepository
+from app.repositories.score_aggregate_repository import ScoreAggregateRepository
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.quiz_shemas import QuizCreateSchema, QuizSchema, QuestionSchema, AnswerSchema, QuizResponseSchema, QuizUpdateSchema, QuestionResponseSchema, AnswerResponseSchema, QuizListSchema, ResultSchema
 import bcrypt
 from app.schemas.user_answer_schemas import AnswerQuestionListSchema, UserAnswerSchemaRedis
 import logging
 from fastapi import HTTPException
-from app.db.user_models import User, Quiz, Question, Answer, Company, Result, UserAnswer, ExportType
+from app.db.user_models import User, Quiz, Question, Answer, Company, Result, UserAnswer, ExportType, ExportSource
 from uuid import UUID
 from typing import Annotated
 from app.auth.jwtauth import oauth2_scheme
 from jose import jwt
 from fastapi import Depends
-from app.db.connect_postgresql import get_session
+from app.db.connect_postgresql import get_session, async_session, async_read_session
 import aioredis
-import json
+from app.utils import serializers
 from app.db.connect_redis import RedisClient
+from app.utils.pagination import split_page
+from app.utils.exports import encode_records, encode_columnar_batches, company_results_schema, require_pyarrow, ROW_EXPORT_TYPES, COLUMNAR_EXPORT_TYPES
+from app.db.quiz_cache import quiz_cache, build_quiz_definition, get_quiz_schema
 import asyncio
 from app.core.config import Settings
+from app.core.background_jobs import background_jobs
+from app.db.leaderboard import leaderboards
 import aioredis
-import csv
 from collections import defaultdict
 
 
+USER_ANSWERS_KEY = "user_answer:{user_id}:{quiz_id}"
+USER_ANSWERS_VERSION_KEY = "user_answer_version:{user_id}:{quiz_id}"
+QUIZ_ANSWERS_KEY = "quiz_answers:{quiz_id}"
+USER_ANSWER_QUIZZES_KEY = "user_answer_quizzes:{user_id}"
+COMPANY_ANSWER_QUIZZES_KEY = "company_answer_quizzes:{company_id}"
+USER_ANSWERS_EXPIRE_TIME = 172800
+EXPORT_BATCH_SIZE = 500
+COLUMNAR_EXPORT_BATCH_SIZE = 10000
+
+
+@background_jobs.register("save_user_answers_to_redis")
+async def save_user_answers_to_redis(user_id: UUID, quiz_id: UUID, company_id: UUID, records: List[dict], submitted_at: float):
+    records = [serializers.dumps(record) for record in records]
+    user_answers_key = USER_ANSWERS_KEY.format(
+        user_id=user_id, quiz_id=quiz_id)
+    quiz_answers_key = QUIZ_ANSWERS_KEY.format(quiz_id=quiz_id)
+    user_quizzes_key = USER_ANSWER_QUIZZES_KEY.format(user_id=user_id)
+    company_quizzes_key = COMPANY_ANSWER_QUIZZES_KEY.format(
+        company_id=company_id)
+    version_key = USER_ANSWERS_VERSION_KEY.format(
+        user_id=user_id, quiz_id=quiz_id)
+
+    redis = await RedisClient().get_redis()
+    async with redis.pipeline(transaction=True) as pipe:
+        # Jobs of two retakes can run out of order, only a newer submission may overwrite.
+        # A concurrent write fails the WATCH and the job is retried.
+        await pipe.watch(version_key)
+        saved_at = await pipe.get(version_key)
+        if saved_at is not None and float(saved_at) >= submitted_at:
+            logging.info(
+                f"Skipped outdated user answers for user {user_id} and quiz {quiz_id}")
+            return
+        pipe.multi()
+        pipe.set(version_key, submitted_at, ex=USER_ANSWERS_EXPIRE_TIME)
+        pipe.delete(user_answers_key)
+        pipe.rpush(user_answers_key, *records)
+        pipe.expire(user_answers_key, USER_ANSWERS_EXPIRE_TIME)
+        pipe.hset(quiz_answers_key, str(user_id),
+                  b"[" + b",".join(records) + b"]")
+        pipe.expire(quiz_answers_key, USER_ANSWERS_EXPIRE_TIME)
+        pipe.sadd(user_quizzes_key, str(quiz_id))
+        pipe.expire(user_quizzes_key, USER_ANSWERS_EXPIRE_TIME)
+        pipe.sadd(company_quizzes_key, str(quiz_id))
+        pipe.expire(company_quizzes_key, USER_ANSWERS_EXPIRE_TIME)
+        await pipe.execute()
+    logging.info(
+        f"Saved {len(records)} user answers in Redis for user {user_id} and quiz {quiz_id}")
+
+
+@background_jobs.register("update_leaderboards")
+async def update_leaderboards(user_id: UUID, quiz_id: UUID, company_id: UUID):
+    # The job can run late or after a newer retake, so publish the current rows
+    # instead of values captured at submit time
+    user_id, quiz_id, company_id = UUID(str(user_id)), UUID(str(quiz_id)), UUID(str(company_id))
+    async with async_session() as session:
+        try:
+            result = await QuizRepository(session).get_quiz_results_for_user(quiz_id, user_id)
+        except HTTPException:
+            logging.info(
+                f"Skipped leaderboard update, result of user {user_id} for quiz {quiz_id} is gone")
+            return
+        avarage_marks = await ScoreAggregateRepository(session).get_user_avarage_marks([user_id])
+    avarage_marks = {row['company_id']: row['avarage_mark'] for row in avarage_marks}
+    await leaderboards.record_submission(user_id, quiz_id, company_id, result.score, avarage_marks.get(None, 0.0), avarage_marks.get(company_id, 0.0))
+
 
 class QuizService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, redis_client: RedisClient = None):
         self.quiz_repository = QuizRepository(db)
+        self.score_aggregate_repository = ScoreAggregateRepository(db)
+        self.redis_client = redis_client or RedisClient()
+
+    async def get_quiz_definition(self, quiz_id: UUID) -> dict:
+        version = await quiz_cache.get_version(quiz_id)
+        quiz_definition = None
+        if version is not None:
+            quiz_definition = await quiz_cache.get(quiz_id, version)
+        if not quiz_definition:
+            quiz = await self.quiz_repository.get_quiz_with_questions(quiz_id)
+            correct_answers = {question.id: {answer.id for answer in question.answers if answer.is_correct}
+                               for question in quiz.questions}
+            quiz_definition = build_quiz_definition(
+                QuizResponseSchema(quiz_info=QuizSchema.from_orm(quiz), questions=[QuestionResponseSchema.from_orm(question) for question in quiz.questions]),
+                {"quiz_id": quiz.id, "company_id": quiz.company_id, "frequency_days": quiz.frequency_days, "correct_answers": correct_answers})
+            if version is not None:
+                await quiz_cache.set(quiz_id, version, quiz_definition)
+        self.quiz_repository.membership_loader.prime_quiz_company_id(
+            quiz_id, quiz_definition['answer_key']['company_id'])
+        return quiz_definition
 
     async def get_quiz_by_id(self, quiz_id: UUID, current_user: User) -> QuizSchema:
         await self.check_if_user_is_owner_or_admin_in_this_quiz_company_by_quiz_id(current_user, quiz_id)
-        quiz = await self.quiz_repository.get_quiz_by_id(quiz_id)
-        return QuizSchema(**quiz)
+        quiz_definition = await self.get_quiz_definition(quiz_id)
+        return get_quiz_schema(quiz_definition).quiz_info
 
-    async def get_quiz_by_id_full_info(self, quiz_id: UUID, current_user: User) -> QuizResponseSchema:
+    async def get_quiz_by_id_full_info(self, quiz_id: UUID, current_user: User):
         await self.check_if_user_is_owner_or_admin_in_this_quiz_company_by_quiz_id(current_user, quiz_id)
-        quiz = await self.quiz_repository.get_quiz_by_id(quiz_id)
-        questions = await self.get_quiz_questions(quiz_id)
-        quiz_response = QuizResponseSchema(quiz_info=quiz, questions=questions)
-        return quiz_response
-
-    async def get_quiz_questions(self, quiz_id: UUID):
-        questions = await self.quiz_repository.get_quiz_questions(quiz_id)
-        list_questions = []
-        for question in questions:
-            question_id = question['id']
-            answers = await self.get_question_answers(question_id)
-            question['answers'] = answers
-            list_questions.append(question)
-
-        return [QuestionResponseSchema(**question) for question in list_questions]
+        quiz_definition = await self.get_quiz_definition(quiz_id)
+        return quiz_definition['quiz_json'], quiz_definition['quiz_etag']
 
     async def check_if_user_is_owner_or_admin_in_this_quiz_company_by_quiz_id(self, current_user: User, quiz_id: UUID):
         current_user_id = current_user.id
@@ -57,15 +134,8 @@ class QuizService:
 
     async def get_quiz_questions_to_response(self, quiz_id: UUID, current_user: User):
         await self.check_if_user_is_owner_or_admin_in_this_quiz_company_by_quiz_id(current_user, quiz_id)
-        questions = await self.quiz_repository.get_quiz_questions(quiz_id)
-        list_questions = []
-        for question in questions:
-            question_id = question['id']
-            answers = await self.get_question_answers_to_response(question_id, current_user)
-            question['answers'] = answers
-            list_questions.append(question)
-
-        return [QuestionResponseSchema(**question) for question in list_questions]
+        quiz_definition = await self.get_quiz_definition(quiz_id)
+        return quiz_definition['questions_json'], quiz_definition['questions_etag']
 
     async def check_if_user_is_owner_or_admin_in_this_quiz_company(self, current_user: User, question_id: UUID):
         current_user_id = current_user.id
@@ -91,11 +161,9 @@ class QuizService:
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
         quiz_dict = await self.quiz_repository.create_quiz(quiz_data.dict(), company_id)
         quiz_id = quiz_dict['id']
-        # List[QuestionSchema]
-        questions = await self.get_quiz_questions(quiz_id)
-        quiz_response = QuizResponseSchema(
-            quiz_info=quiz_dict, questions=questions)
-        return quiz_response
+        await quiz_cache.bump_version(quiz_id)
+        quiz_definition = await self.get_quiz_definition(quiz_id)
+        return get_quiz_schema(quiz_definition)
 
     async def delete_quiz(self, quiz_id: UUID, current_user: User) -> str:
         current_user_id = current_user.id
@@ -103,6 +171,7 @@ class QuizService:
         quiz_company_id = quiz['company_id']
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, quiz_company_id)
         await self.quiz_repository.delete_quiz(quiz_id)
+        await quiz_cache.bump_version(quiz_id)
         return {"message": "Quiz deleted"}
 
     async def update_quiz(self, quiz_data: QuizUpdateSchema, quiz_id: UUID, current_user: User) -> QuizSchema:
@@ -112,19 +181,16 @@ class QuizService:
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, quiz_company_id)
         quiz_dict = await self.quiz_repository.update_quiz(quiz_id, quiz_data.dict())
         quiz_id = quiz_dict['id']
-        # List[QuestionSchema]
-        questions = await self.get_quiz_questions(quiz_id)
-        quiz_response = QuizResponseSchema(
-            quiz_info=quiz_dict, questions=questions)
-        return quiz_response
+        await quiz_cache.bump_version(quiz_id)
+        quiz_definition = await self.get_quiz_definition(quiz_id)
+        return get_quiz_schema(quiz_definition)
 
-    async def list_quizzes(self, company_id: UUID, current_user: User, page: int, limit: int) -> QuizListSchema:
-        current_user_id = current_user.id
-        await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
+    async def list_quizzes(self, company_id: UUID, current_user: User, page: int, limit: int, cursor: Optional[str] = None) -> QuizListSchema:
         current_user_id = current_user.id
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
-        quizzes = await self.quiz_repository.list_quizzes(company_id, page, limit)
-        return [QuizSchema(**quiz) for quiz in quizzes]
+        quizzes = await self.quiz_repository.list_quizzes(company_id, page, limit, cursor)
+        quizzes, next_cursor = split_page(quizzes, limit)
+        return QuizListSchema(quizzes=[QuizSchema.from_orm(quiz) for quiz in quizzes], next_cursor=next_cursor)
 
 
 # be-12
@@ -137,111 +203,98 @@ class QuizService:
         user_answers = await self.quiz_repository.get_user_answers_by_result_id(result_id)
         return user_answers
 
-    async def get_data_from_redis(self, key: str):
-        redis_client = RedisClient()
-        data = await redis_client.get_data(key)
-        if data:
-            data = json.loads(data)
-            return data
-        else:
+    async def get_data_from_redis(self, user_id: UUID, quiz_id: UUID):
+        redis = await self.redis_client.get_redis()
+        data = await redis.lrange(USER_ANSWERS_KEY.format(user_id=user_id, quiz_id=quiz_id), 0, -1)
+        if not data:
             raise HTTPException(
                 status_code=404, detail="Data not found in Redis")
+        return [serializers.loads(record) for record in data]
         
-    async def save_user_answers_to_json(self, user_answer_records: list):
-        with open('user_answer_records.json', 'w') as jsonfile:
-            json.dump(user_answer_records, jsonfile)
-
     async def get_all_user_answer_records(self, user_id: UUID, quiz_id: UUID):
-        redis_client = RedisClient()
-        user_answer_records = []
-        async for key in redis_client.scan_iter(f'user_answer:{user_id}:{quiz_id}:*'):
-            data = await redis_client.get_data(key)
-            data = json.loads(data)
-            user_answer_records.append(data)
-
-        await self.save_user_answers_to_csv(user_answer_records)
+        user_answer_records = await self.get_user_results_of_quizzes_in_company(user_id, quiz_id)
         return user_answer_records
-    
-    async def get_all_user_answer_records(self, user_id: UUID, quiz_id: UUID, type: str):
-         redis_client = RedisClient()
-         user_answer_records = []
-         async for key in redis_client.scan_iter(f'user_answer:{user_id}:{quiz_id}:*'):
-             data = await redis_client.get_data(key)
-             data = json.loads(data)
-             user_answer_records.append(data)
-         if type == ExportType.CSV:
-             await self.save_user_answers_to_csv(user_answer_records)
-         elif type == ExportType.JSON:
-             await self.save_user_answers_to_json(user_answer_records)
-         return user_answer_records
-
-    async def save_user_answers_to_csv(self, user_answer_records: list):
-        with open('user_answer_records.csv', 'w', newline='') as csvfile:
-            fieldnames = user_answer_records[0].keys()
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for record in user_answer_records:
-                writer.writerow(record)
-
-    async def save_user_answers_to_redis(self, result_id: UUID):
-        redis_client = RedisClient()
-
-        user_answer_list = await self.get_user_answers_by_result_id(result_id)
-        redis_id = 0
-        for user_answer in user_answer_list:
-            user_answer_id = user_answer.answer_id
-            user_answer_question_id = user_answer.question_id
-            user_answer_result_id = result_id
-            user_answer_user_id = await self.quiz_repository.get_user_id_by_result_id(user_answer_result_id)
-            user_answer_quiz_id = await self.quiz_repository.get_quiz_id_by_result_id(user_answer_result_id)
-            user_answer_company_id = await self.quiz_repository.get_company_id_by_quiz_id(user_answer_quiz_id)
-            is_correct = await self.quiz_repository.check_if_user_answer_is_correct(user_answer_id, user_answer_question_id)
-
-            save_data = {
-                "question_id": str(user_answer_question_id),
-                "answer_id": str(user_answer_id),
-                "user_id": str(user_answer_user_id),
-                "quiz_id": str(user_answer_quiz_id),
-                "company_id": str(user_answer_company_id),
-                "is_correct": is_correct
-            }
-            save_data = json.dumps(save_data)
-
-            key = f"user_answer:{user_answer_user_id}:{user_answer_quiz_id}:{redis_id}"
-            redis_id += 1
-            await redis_client.set_data(key, save_data)
-            logging.info(f"Data saved in Redis: {save_data}")
+
+    async def stream_user_answer_records(self, user_id: UUID, quiz_id: UUID, source: ExportSource):
+        if source == ExportSource.REDIS:
+            redis = await self.redis_client.get_redis()
+            key = USER_ANSWERS_KEY.format(user_id=user_id, quiz_id=quiz_id)
+            start = 0
+            while True:
+                records = await redis.lrange(key, start, start + EXPORT_BATCH_SIZE - 1)
+                for record in records:
+                    yield serializers.loads(record)
+                if len(records) < EXPORT_BATCH_SIZE:
+                    return
+                start += EXPORT_BATCH_SIZE
+        else:
+            # The request session is closed before a streamed body is sent,
+            # so the export reads through a session of its own
+            async with async_read_session() as session:
+                async for record in QuizRepository(session).stream_user_answer_records(user_id, quiz_id):
+                    yield record
+
+    def export_user_answer_records(self, user_id: UUID, quiz_id: UUID, type: ExportType, source: ExportSource):
+        if type not in ROW_EXPORT_TYPES:
+            raise HTTPException(
+                status_code=400, detail="Quiz results can be exported only as csv, json or ndjson")
+        records = self.stream_user_answer_records(user_id, quiz_id, source)
+        return encode_records(records, type)
+
+    async def get_user_answer_record(self, user_id: UUID, quiz_id: UUID, redis_id: int):
+        redis = await self.redis_client.get_redis()
+        data = await redis.lindex(USER_ANSWERS_KEY.format(user_id=user_id, quiz_id=quiz_id), redis_id)
+        if not data:
+            raise HTTPException(
+                status_code=404, detail="Data not found in Redis")
+        return serializers.loads(data)
+
+    def build_user_answer_records(self, user_id: UUID, answer_key: dict, user_answers: List[dict]) -> List[dict]:
+        correct_answers = answer_key['correct_answers']
+        records = []
+        for answer in user_answers:
+            question_id = answer['question_id']
+            question_correct_answers = correct_answers.get(question_id, set())
+            for ans in answer['answers']:
+                records.append({
+                    "question_id": question_id,
+                    "answer_id": ans['answer_id'],
+                    "user_id": user_id,
+                    "quiz_id": answer_key['quiz_id'],
+                    "company_id": answer_key['company_id'],
+                    "is_correct": ans['answer_id'] in question_correct_answers
+                })
+        return records
+
+    def score_quiz_answers(self, answer_key: dict, user_answers: List[dict]):
+        user_answers_ids = {ans['answer_id']
+                            for answer in user_answers for ans in answer['answers']}
+        correct_answers = 0
+        for question_correct_answers in answer_key['correct_answers'].values():
+            correct_answers += len(question_correct_answers & user_answers_ids)
+        questions = len(answer_key['correct_answers'])
+        return correct_answers, questions
 
     async def submit_quiz_answers(self, user_answers: AnswerQuestionListSchema, company_id: UUID, quiz_id: UUID, current_user: User):
         current_user_id = current_user.id
         await self.check_if_user_member_of_company(current_user_id, company_id)
-        check = await self.check_if_user_alredy_submitted_quiz(current_user_id, quiz_id)
-        if check:
-            raise HTTPException(
-                status_code=400, detail="You already submitted this quiz")
-        await self.quiz_repository.check_if_quiz_exists(quiz_id)
-        question_ids_list = await self.quiz_repository.if_questions_exists_get_questions_ids_list(quiz_id)
-        questions_answers_list_dicts = await self.quiz_repository.get_questions_answers_list_dicts(question_ids_list)
+        quiz_definition = await self.get_quiz_definition(quiz_id)
+        answer_key = quiz_definition['answer_key']
+        if not answer_key['correct_answers']:
+            raise HTTPException(status_code=404, detail="Questions not found")
 
         user_answers_list_dicts = user_answers.dict()
         user_answers = user_answers_list_dicts['questions_answers']
-        user_answers_list_ids = [ans['answer_id']
-                                 for answer in user_answers for ans in answer['answers']]
-
-        correct_answers = 0
-        questions = 0
-        for question_answers in questions_answers_list_dicts:
-            for question_answer in question_answers:
-                if question_answer['is_correct'] and question_answer['id'] in user_answers_list_ids:
-                    correct_answers += 1
-            questions += 1
-
-        result = await self.quiz_repository.submit_quiz_result(correct_answers, questions, quiz_id, current_user_id)
-        result_id = result.id
-        result_score = result.score
-        await self.quiz_repository.save_user_answers(user_answers, result_id)
-        await self.save_user_answers_to_redis(result_id)
+        correct_answers, questions = self.score_quiz_answers(
+            answer_key, user_answers)
+
+        result = await self.quiz_repository.submit_quiz_result(correct_answers, questions, quiz_id, answer_key['company_id'], answer_key['frequency_days'], current_user_id, user_answers)
+        result_score = result['score']
+        records = self.build_user_answer_records(
+            current_user_id, answer_key, user_answers)
+        if records:
+            await background_jobs.enqueue("save_user_answers_to_redis", user_id=current_user_id, quiz_id=quiz_id, company_id=answer_key['company_id'], records=records, submitted_at=result['created_at'].timestamp())
+        await background_jobs.enqueue("update_leaderboards", user_id=current_user_id, quiz_id=quiz_id, company_id=answer_key['company_id'])
         return {"message": "Quiz submitted successfully", "score": result_score}
 
     async def get_quiz_results(self, company_id: UUID, quiz_id: UUID, current_user: User) -> ResultSchema:
@@ -262,13 +315,8 @@ class QuizService:
         if current_user_id != user_id:
             raise HTTPException(
                 status_code=401, detail="You are not this user to get this information")
-        results = await self.quiz_repository.get_user_results_of_quizzes(user_id)
-        sum_of_scores = 0
-        quizzes = 0
-        for result in results:
-            sum_of_scores += result.score
-            quizzes += 1
-        avarage_mark = sum_of_scores/quizzes
+        aggregate = await self.score_aggregate_repository.get_user_aggregate(user_id)
+        avarage_mark = aggregate.score_sum/aggregate.quiz_count
         return {"message": f"Avarage mark from quizzes for user with id:{user_id}", "avarage_mark": avarage_mark}
 
     async def get_user_avarage_mark_from_quizzes_in_company(self, user_id: UUID, company_id: UUID, current_user: User):
@@ -277,13 +325,8 @@ class QuizService:
         if current_user_id != user_id:
             raise HTTPException(
                 status_code=401, detail="You are not this user to get this information")
-        results = await self.quiz_repository.get_user_results_of_quizzes_in_company(company_id, user_id)
-        sum_of_scores = 0
-        quizzes = 0
-        for result in results:
-            sum_of_scores += result.score
-            quizzes += 1
-        avarage_mark = sum_of_scores/quizzes
+        aggregate = await self.score_aggregate_repository.get_user_aggregate(user_id, company_id)
+        avarage_mark = aggregate.score_sum/aggregate.quiz_count
         return {"message": f"Avarage mark from quizzes for user with id:{user_id} in company with id:{company_id}", "avarage_mark": avarage_mark}
 
     # be-14
@@ -291,49 +334,68 @@ class QuizService:
         current_user_id = current_user.id
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
         await self.check_if_user_member_of_company(user_id, company_id)
-        quiz_ids_of_this_company = await self.quiz_repository.get_quiz_ids_of_company(company_id)
+        redis = await self.redis_client.get_redis()
+        quiz_ids = await redis.sinter(USER_ANSWER_QUIZZES_KEY.format(user_id=user_id), COMPANY_ANSWER_QUIZZES_KEY.format(company_id=company_id))
+        quiz_ids = [quiz_id.decode('utf-8') for quiz_id in quiz_ids]
+        async with redis.pipeline(transaction=False) as pipe:
+            for quiz_id in quiz_ids:
+                pipe.lrange(USER_ANSWERS_KEY.format(
+                    user_id=user_id, quiz_id=quiz_id), 0, -1)
+            quizzes_records = await pipe.execute()
+
         user_result_all = []
-        for quiz_id in quiz_ids_of_this_company:
-            user_result = await self.get_user_results_of_quizzes_in_company(user_id, quiz_id)
-            if user_result:
-                user_result_all.append(user_result)
-            if not user_result_all:
-                raise HTTPException(
-                    status_code=404, detail="Results not found for this user in")
+        for records in quizzes_records:
+            if records:
+                user_result_all.append([serializers.loads(record)
+                                       for record in records])
+        if not user_result_all:
+            raise HTTPException(
+                status_code=404, detail="Results not found for this user in")
 
-        user_result_all = {"quiz_id": quiz_id, "quiz_results": user_result_all}
+        user_result_all = {"quiz_id": quiz_ids[-1], "quiz_results": user_result_all}
 
         return {"message": f"Results of user with id:{user_id} in company with id:{company_id}", "results": user_result_all}
 
     async def get_user_results_of_quizzes_in_company(self, user_id: UUID, quiz_id: UUID):
-        redis_client = RedisClient()
-        user_answer_records = []
-        async for key in redis_client.scan_iter(f'user_answer:{user_id}:{quiz_id}:*'):
-            data = await redis_client.get_data(key)
-            data = json.loads(data)
-            if data:
-                user_answer_records.append(data)
-
-        return user_answer_records
+        redis = await self.redis_client.get_redis()
+        records = await redis.lrange(USER_ANSWERS_KEY.format(user_id=user_id, quiz_id=quiz_id), 0, -1)
+        return [serializers.loads(record) for record in records]
 
     async def get_results_of_all_users_in_quiz_id(self, quiz_id: UUID):
-        redis_client = RedisClient()
-        user_answer_records = []
-        async for key in redis_client.scan_iter(f'user_answer:*:{quiz_id}:*'):
-            data = await redis_client.get_data(key)
-            data = json.loads(data)
-            if data:
-                user_answer_records.append(data)
+        redis = await self.redis_client.get_redis()
+        users_records = await redis.hvals(QUIZ_ANSWERS_KEY.format(quiz_id=quiz_id))
+        return [record for records in users_records for record in serializers.loads(records)]
 
-        return user_answer_records
+    async def stream_company_results_batches(self, company_id: UUID):
+        async with async_read_session() as session:
+            async for rows in QuizRepository(session).stream_company_results_batches(company_id, COLUMNAR_EXPORT_BATCH_SIZE):
+                yield rows
+
+    async def export_company_results(self, company_id: UUID, type: ExportType, current_user: User):
+        if type not in COLUMNAR_EXPORT_TYPES:
+            raise HTTPException(
+                status_code=400, detail="Company results can be exported only as parquet or arrow")
+        require_pyarrow()
+        current_user_id = current_user.id
+        await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
+        batches = self.stream_company_results_batches(company_id)
+        return encode_columnar_batches(batches, company_results_schema(), type)
 
     async def get_results_of_all_users_in_company(self, company_id: UUID, current_user: User):
         current_user_id = current_user.id
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
-        quiz_ids_of_this_company = await self.quiz_repository.get_quiz_ids_of_company(company_id)
+        redis = await self.redis_client.get_redis()
+        quiz_ids = await redis.smembers(COMPANY_ANSWER_QUIZZES_KEY.format(company_id=company_id))
+        async with redis.pipeline(transaction=False) as pipe:
+            for quiz_id in quiz_ids:
+                pipe.hvals(QUIZ_ANSWERS_KEY.format(
+                    quiz_id=quiz_id.decode('utf-8')))
+            quizzes_records = await pipe.execute()
+
         all_results = []
-        for quiz_id in quiz_ids_of_this_company:
-            results = await self.get_results_of_all_users_in_quiz_id(quiz_id)
+        for users_records in quizzes_records:
+            results = [record for records in users_records for record in serializers.loads(
+                records)]
             if results:
                 all_results.append(results)
         if not all_results:
@@ -343,13 +405,8 @@ class QuizService:
         return {"message": f"Results of all users in company with id:{company_id}", "results": all_results}
 
     async def get_user_rating(self, user_id: UUID):
-        results = await self.quiz_repository.get_user_results_of_quizzes(user_id)
-        sum_of_scores = 0
-        quizzes = 0
-        for result in results:
-            sum_of_scores += result.score
-            quizzes += 1
-        avarage_mark = sum_of_scores/quizzes
+        aggregate = await self.score_aggregate_repository.get_user_aggregate(user_id)
+        avarage_mark = aggregate.score_sum/aggregate.quiz_count
         return {"message": f"Avarage mark from quizzes for user with id:{user_id}", "avarage_mark": avarage_mark}
 
     async def get_score_from_result(self, result_id: UUID):
@@ -357,20 +414,9 @@ class QuizService:
         return result
 
     async def get_average_scores(self, user_id: UUID):
-        results = await self.quiz_repository.get_user_results_of_quizzes_for(user_id)
-        if results == None:
+        list_of_avarage_marks = await self.quiz_repository.get_user_running_average_scores(user_id)
+        if not list_of_avarage_marks:
             return None
-        sum_of_scores = 0
-        quizzes = 0
-        list_of_avarage_marks = []
-        for result in results:
-            sum_of_scores += result.score
-            quizzes += 1
-            avarage_mark = sum_of_scores/quizzes
-
-            list_of_avarage_marks.append(
-                {"quiz_id": result.quiz_id, "avarage_mark": avarage_mark, "score": result.score, "result_id": result.id})
-
         return list_of_avarage_marks
 
     async def get_list_of_quizzes_which_i_submit(self, user_id: UUID):
@@ -383,16 +429,22 @@ class QuizService:
             list_of_quizzes.append(quiz)
         return list_of_quizzes
 
+    async def stream_user_results(self, user_id: UUID):
+        async with async_read_session() as session:
+            async for result in QuizRepository(session).stream_user_results_of_quizzes(user_id):
+                yield {**ResultSchema.from_orm(result).model_dump(), "date": result.created_at}
+
     async def get_avarage_marks_all_members(self, current_user: User, company_id: UUID):
         current_user_id = current_user.id
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
-        all_members = await self.quiz_repository.get_all_members_of_company(company_id)
         all_members_avarage_marks = []
-        for member in all_members:
-            member_id = member.user_id
-            member_avarage_mark = await self.get_average_scores(member_id)
-            if member_avarage_mark != None:
-                all_members_avarage_marks.append(member_avarage_mark)
+        member_id = None
+        async for row in self.quiz_repository.stream_company_members_running_average_scores(company_id):
+            row_member_id = row.pop('user_id')
+            if row_member_id != member_id:
+                member_id = row_member_id
+                all_members_avarage_marks.append([])
+            all_members_avarage_marks[-1].append(row)
 
         return all_members_avarage_marks
 
@@ -406,13 +458,5 @@ class QuizService:
     async def get_members_and_last_quiz_submition(self, current_user: User, company_id: UUID):
         current_user_id = current_user.id
         await self.check_if_user_is_admin_or_owner_in_company(current_user_id, company_id)
-        all_members = await self.quiz_repository.get_all_members_of_company(company_id)
-        members_last_quiz_submition = []
-        for member in all_members:
-            member_id = member.user_id
-            last_quiz_submition = await self.quiz_repository.get_last_quiz_submition(member_id)
-            if last_quiz_submition != None:
-                members_last_quiz_submition.append(
-                    {"user_id": member_id, "quiz_id": last_quiz_submition.quiz_id, "last_quiz_submition": last_quiz_submition.created_at})
-
+        members_last_quiz_submition = [row async for row in self.score_aggregate_repository.stream_company_members_last_quiz_submition(company_id)]
         return members_last_quiz_submition
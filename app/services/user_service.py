@@ -6,13 +6,15 @@ import bcrypt
 import logging
 from fastapi import HTTPException
 from app.db.user_models import User
+from app.utils.pagination import split_page
 from uuid import UUID
 from app.utils.utils import verify_password, hash_password
 from typing import Annotated
 from app.auth.jwtauth import oauth2_scheme
+from app.auth.token_cache import token_cache, hash_token
 from jose import jwt
 from fastapi import Depends
-from app.db.connect_postgresql import get_session
+from app.db.connect_postgresql import get_session, async_read_session
 from app.core.config import Settings
 from app.schemas.auth_schemas import TokenData
 from jose import JWTError
@@ -24,6 +26,11 @@ settings = Settings()
 
 
 async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_session)) -> UserDetailSchema:
+    token_hash = hash_token(token.credentials)
+    cached = await token_cache.get(token_hash)
+    if cached:
+        return UserDetailSchema(**cached['user'])
+
     try:
         payload = jwt.decode(token.credentials, settings.auth0_secret_key,
                              algorithms=[settings.jwt_algorithm], audience=settings.auth0_audience, issuer=settings.auth0_issuer)
@@ -43,15 +50,18 @@ async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: A
             status_code=401, detail="Token has expired")
     old_user = await UserRepository(db).get_user_by_email(email=token_data.email)
     if not old_user:
-        user_creation = await UserService(db).create_user_from_token(email=token_data.email)
-        return user_creation
+        user = await UserService(db).create_user_from_token(email=token_data.email)
     else:
         exp_date = datetime.fromtimestamp(token_data.exp)
         current_date = datetime.now()
         if current_date > exp_date:
             raise HTTPException(
                 status_code=401, detail="Token has expired")
-        return old_user
+        user = old_user
+
+    user_snapshot = UserDetailSchema.from_orm(user)
+    await token_cache.set(token_hash, token_data.dict(), user_snapshot.model_dump(mode='json'))
+    return user_snapshot
 
 
 class UserService:
@@ -79,13 +89,21 @@ class UserService:
         users = await self.user_repository.get_users_list()
         return users
 
-    async def get_users_list_paginated(self, page: int, limit: int) -> List[UserDetailSchema]:
-        users = await self.user_repository.get_users_list_paginated(page, limit)
-        return UserListSchema(users=[UserDetailSchema.from_orm(user) for user in users])
+    async def stream_users(self):
+        # Streamed bodies outlive the request session, so the stream owns one
+        async with async_read_session() as session:
+            async for user in UserRepository(session).stream_users():
+                yield UserDetailSchema.from_orm(user).model_dump()
+
+    async def get_users_list_paginated(self, page: int, limit: int, cursor: Optional[str] = None) -> UserListSchema:
+        users = await self.user_repository.get_users_list_paginated(page, limit, cursor)
+        users, next_cursor = split_page(users, limit)
+        return UserListSchema(users=[UserDetailSchema.from_orm(user) for user in users], next_cursor=next_cursor)
 
     async def delete_user(self, user_id: UUID, current_user: User) -> None:
         await self.check_user_permissions(user_id, current_user.id)
         await self.user_repository.delete_user(user_id)
+        await token_cache.invalidate_user(user_id)
 
     async def update_user(self, user_id: UUID, user_data: UserUpdateRequestSchema, current_user: User) -> UserDetailSchema:
         await self.check_user_permissions(user_id, current_user.id)
@@ -105,6 +123,7 @@ class UserService:
                 status_code=400, detail="incorrect password")
 
         updated_user = await self.user_repository.update_user(user, user_data)
+        await token_cache.invalidate_user(user_id)
         return updated_user
 
     async def get_user_by_username(self, username: str) -> User:
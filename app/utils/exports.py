@@ -0,0 +1,133 @@
+import csv
+import io
+from typing import AsyncIterator, List
+from fastapi import HTTPException
+from app.db.user_models import ExportType
+from app.utils import serializers
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportType.CSV: "text/csv",
+    ExportType.JSON: "application/json",
+    ExportType.NDJSON: "application/x-ndjson",
+    ExportType.PARQUET: "application/vnd.apache.parquet",
+    ExportType.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+ROW_EXPORT_TYPES = (ExportType.CSV, ExportType.JSON, ExportType.NDJSON)
+COLUMNAR_EXPORT_TYPES = (ExportType.PARQUET, ExportType.ARROW)
+
+
+def _csv_row(row: list) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode('utf-8')
+
+
+async def encode_records(records: AsyncIterator[dict], export_type: ExportType) -> AsyncIterator[bytes]:
+    """Encode records one by one as they arrive, never holding the whole export."""
+    if export_type == ExportType.CSV:
+        fieldnames = None
+        async for record in records:
+            if fieldnames is None:
+                fieldnames = list(record.keys())
+                yield _csv_row(fieldnames)
+            yield _csv_row([record[field] for field in fieldnames])
+    elif export_type == ExportType.JSON:
+        separator = b"["
+        async for record in records:
+            yield separator + serializers.dumps(record)
+            separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+    elif export_type == ExportType.NDJSON:
+        async for record in records:
+            yield serializers.dumps(record) + b"\n"
+    else:
+        raise ValueError(f"{export_type.value} is not a row export type")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise HTTPException(
+            status_code=501, detail="Parquet and Arrow exports require pyarrow to be installed")
+
+
+def company_results_schema() -> "pa.Schema":
+    uuid_type = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("result_id", uuid_type),
+        ("user_id", uuid_type),
+        ("quiz_id", uuid_type),
+        ("score", pa.float64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("question_id", uuid_type),
+        ("answer_id", uuid_type),
+        ("is_correct", pa.bool_()),
+    ])
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps its position but hands the bytes back in chunks.
+
+    pyarrow writers need a file with tell(), the Parquet footer records the
+    offset of every row group, so the sink tracks the position while the
+    buffered bytes are drained after each batch.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _record_batch(rows: List[dict], schema) -> "pa.RecordBatch":
+    columns = []
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if pa.types.is_dictionary(field.type):
+            columns.append(pa.array([str(value) for value in values],
+                                    type=pa.string()).dictionary_encode())
+        else:
+            columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+async def encode_columnar_batches(batches: AsyncIterator[List[dict]], schema, export_type: ExportType) -> AsyncIterator[bytes]:
+    """Encode row batches as Parquet row groups or Arrow IPC stream batches."""
+    sink = _ChunkSink()
+    if export_type == ExportType.PARQUET:
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        async for rows in batches:
+            if rows:
+                writer.write_batch(_record_batch(rows, schema))
+                yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
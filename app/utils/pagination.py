@@ -0,0 +1,34 @@
+import base64
+from typing import Optional, List, Tuple
+from uuid import UUID
+from fastapi import HTTPException
+
+
+def encode_cursor(last_id: UUID) -> str:
+    return base64.urlsafe_b64encode(last_id.bytes).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> UUID:
+    try:
+        return UUID(bytes=base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate_query(query, key_column, page: int, limit: int, cursor: Optional[str] = None):
+    """Order by key_column and fetch one extra row to know if a next page exists.
+
+    With a cursor the page starts right after the encoded key (keyset
+    pagination), otherwise page falls back to OFFSET over the same ordering.
+    """
+    query = query.order_by(key_column).limit(limit + 1)
+    if cursor:
+        return query.where(key_column > decode_cursor(cursor))
+    return query.offset((page - 1) * limit)
+
+
+def split_page(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
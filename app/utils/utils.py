@@ -1,11 +1,70 @@
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from app.core.config import Settings
 
 
-async def hash_password(password: str) -> str:
+settings = Settings()
+
+password_hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hashing_workers, thread_name_prefix="password-hashing")
+
+password_hashing_semaphore = None
+
+password_hashing_stats = {
+    "workers": settings.password_hashing_workers,
+    "max_queue": settings.password_hashing_max_queue,
+    "in_flight": 0,
+    "waiting": 0,
+    "completed": 0,
+    "rejected": 0
+}
+
+
+def get_password_hashing_stats() -> dict:
+    return dict(password_hashing_stats)
+
+
+async def run_password_hashing(func, *args):
+    global password_hashing_semaphore
+    if password_hashing_semaphore is None:
+        password_hashing_semaphore = asyncio.Semaphore(
+            settings.password_hashing_workers)
+    if password_hashing_stats["waiting"] >= settings.password_hashing_max_queue:
+        password_hashing_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503, detail="Too many password hashing requests, try again later")
+
+    password_hashing_stats["waiting"] += 1
+    try:
+        await password_hashing_semaphore.acquire()
+    finally:
+        password_hashing_stats["waiting"] -= 1
+
+    password_hashing_stats["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_hashing_executor, func, *args)
+    finally:
+        password_hashing_stats["in_flight"] -= 1
+        password_hashing_stats["completed"] += 1
+        password_hashing_semaphore.release()
+
+
+def _hash_password(password: str) -> str:
     hashed_password = bcrypt.hashpw(
-        password.encode('utf-8'), bcrypt.gensalt())
+        password.encode('utf-8'), bcrypt.gensalt(rounds=settings.bcrypt_rounds))
     return hashed_password.decode('utf-8')
 
 
-async def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+async def hash_password(password: str) -> str:
+    return await run_password_hashing(_hash_password, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_hashing(_verify_password, plain_password, hashed_password)
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.db.connect_postgresql import DATABASE_URL
+from app.repositories.company_repository import CompanyRepository
+from app.repositories.quiz_repository import QuizRepository
+from app.repositories.user_repository import UserRepository
+from app.utils.pagination import encode_cursor
+
+
+ID = uuid.uuid4()
+
+# Repository calls paired with the index that should serve the statements they run
+QUERIES = [
+    (lambda db: QuizRepository(db).check_if_user_alredy_submitted_quiz(ID, ID), '_results_user_quiz_uc'),
+    (lambda db: QuizRepository(db).get_user_running_average_scores(ID), 'ix_results_user_id_created_at'),
+    (lambda db: UserRepository(db).get_my_invitations(ID), 'ix_actions_user_id_status'),
+    (lambda db: CompanyRepository(db).get_requested_users(ID), 'ix_actions_company_id_status'),
+    (lambda db: QuizRepository(db).get_quiz_questions_ids(ID), 'ix_questions_quiz_id'),
+    (lambda db: QuizRepository(db).get_question_answers(ID), 'ix_answers_question_id'),
+    (lambda db: QuizRepository(db).get_user_answers_by_result_id(ID), 'ix_user_answer_result_id'),
+    (lambda db: QuizRepository(db).list_quizzes(ID, 1, 5), 'ix_quizzes_company_id'),
+    (lambda db: CompanyRepository(db).get_company_list_paginated(1, 5, encode_cursor(ID)), 'ix_company_visible_id'),
+]
+
+
+async def explain(call) -> str:
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    try:
+        async with engine.connect() as conn:
+            indexes = await conn.execute(text("SELECT count(*) FROM pg_indexes WHERE indexname = '_results_user_quiz_uc'"))
+            if not indexes.scalar():
+                pytest.skip("Database is not migrated to the latest revision")
+            # Empty test tables are cheapest to seq scan, so make the planner show its index choice
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            event.listen(engine.sync_engine, "before_cursor_execute", capture)
+            try:
+                await call(AsyncSession(bind=conn))
+            except HTTPException:
+                pass
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", capture)
+            plans = []
+            for statement, parameters in statements:
+                plan = await conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+                plans.append("\n".join(row[0] for row in plan))
+            return "\n\n".join(plans)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("call, index_name", QUERIES, ids=[index for _, index in QUERIES])
+def test_query_uses_index(call, index_name):
+    try:
+        plan = asyncio.run(explain(call))
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    assert index_name in plan, plan
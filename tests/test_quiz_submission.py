@@ -0,0 +1,90 @@
+import asyncio
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, text, func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.db.connect_postgresql import DATABASE_URL
+from app.db.user_models import Answer, Company, Question, Quiz, Result, ScoreAggregate, User, UserAnswer
+from app.repositories.quiz_repository import QuizRepository
+from app.services.quiz_service import QuizService
+
+
+def test_score_quiz_answers():
+    questions = [uuid.uuid4(), uuid.uuid4()]
+    correct = [uuid.uuid4(), uuid.uuid4(), uuid.uuid4()]
+    wrong = uuid.uuid4()
+    answer_key = {"correct_answers": {questions[0]: {correct[0]}, questions[1]: {correct[1], correct[2]}}}
+    user_answers = [
+        {"question_id": questions[0], "answers": [{"answer_id": correct[0]}]},
+        {"question_id": questions[1], "answers": [{"answer_id": correct[1]}, {"answer_id": wrong}]},
+    ]
+    assert QuizService(None).score_quiz_answers(answer_key, user_answers) == (2, 2)
+    assert QuizService(None).score_quiz_answers(answer_key, []) == (0, 2)
+
+
+async def submit_quiz_flow():
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            indexes = await conn.execute(text("SELECT count(*) FROM pg_indexes WHERE indexname = '_results_user_quiz_uc'"))
+            if not indexes.scalar():
+                pytest.skip("Database is not migrated to the latest revision")
+            # Repository commits only release a savepoint, the outer transaction is rolled back
+            await conn.begin()
+            db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint")
+            suffix = uuid.uuid4().hex[:8]
+            user = User(username=f"user_{suffix}", password="x", email=f"{suffix}@example.com")
+            company = Company(name=f"company_{suffix}")
+            db.add_all([user, company])
+            await db.flush()
+            quiz = Quiz(title="quiz", frequency_days=1, company_id=company.id)
+            db.add(quiz)
+            await db.flush()
+            question = Question(question_text="question", quiz_id=quiz.id)
+            db.add(question)
+            await db.flush()
+            right = Answer(answer_text="right", is_correct=True, question_id=question.id)
+            wrong = Answer(answer_text="wrong", is_correct=False, question_id=question.id)
+            db.add_all([right, wrong])
+            await db.flush()
+
+            repository = QuizRepository(db)
+
+            def answers(answer):
+                return [{"question_id": question.id, "answers": [{"answer_id": answer.id}]}]
+
+            first = await repository.submit_quiz_result(0, 1, quiz.id, company.id, quiz.frequency_days, user.id, answers(wrong))
+            assert first['inserted'] is True
+            assert first['previous_score'] is None
+            assert first['avarage_mark'] == 0
+
+            with pytest.raises(HTTPException) as error:
+                await repository.submit_quiz_result(1, 1, quiz.id, company.id, quiz.frequency_days, user.id, answers(right))
+            assert error.value.status_code == 400
+
+            await db.execute(text("UPDATE results SET created_at = now() - interval '2 days' WHERE id = :id"), {"id": first['id']})
+            retake = await repository.submit_quiz_result(1, 1, quiz.id, company.id, quiz.frequency_days, user.id, answers(right))
+            assert retake['inserted'] is False
+            assert retake['id'] == first['id']
+            assert retake['previous_score'] == 0
+            assert retake['avarage_mark'] == 1
+            assert retake['company_avarage_mark'] == 1
+
+            results = await db.execute(select(func.count()).select_from(Result).where(Result.user_id == user.id))
+            assert results.scalar() == 1
+            user_answers = await db.execute(select(UserAnswer.answer_id).where(UserAnswer.result_id == first['id']))
+            assert user_answers.scalars().all() == [right.id]
+            aggregate = await db.execute(select(ScoreAggregate.quiz_count, ScoreAggregate.score_sum).where(ScoreAggregate.user_id == user.id).where(ScoreAggregate.company_id.is_(None)))
+            assert tuple(aggregate.one()) == (1, 1)
+            await conn.rollback()
+    finally:
+        await engine.dispose()
+
+
+def test_submit_quiz_result_retake_window():
+    try:
+        asyncio.run(submit_quiz_flow())
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")